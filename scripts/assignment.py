@@ -0,0 +1,224 @@
+# Cost of an assignment that must never be made.
+INFINITY = float('inf')
+
+# Returns a list of (row, col) pairs forming a minimum cost assignment for the
+# given cost matrix (a list of equal length rows). The matrix need not be
+# square: if there are fewer rows than columns, every row is assigned a
+# distinct column, and otherwise every column is assigned a distinct row. Rows
+# (or columns) that can only be assigned at INFINITY cost are left unassigned.
+# Pairs are sorted by row.
+def solve(costs):
+   if len(costs) == 0 or len(costs[0]) == 0:
+      return []
+   return IncrementalAssignment(costs).solve()
+
+class IncrementalAssignment:
+   # Initializes an assignment problem for the given cost matrix with all rows
+   # and columns active and nothing assigned. The problem can be changed after
+   # solving (costs raised or lowered, rows and columns deactivated or
+   # reactivated), and solving again repairs only the part of the assignment
+   # affected by the changes.
+   #
+   # Internally, rows are the shorter side of the matrix, and each active row
+   # is assigned a distinct column by a shortest augmenting path search
+   # (Dijkstra's algorithm on reduced costs) that keeps row potentials u and
+   # column potentials v feasible. The potentials are kept between solves, so
+   # later solves start from the previous duals. Every row also has a dummy
+   # column it can take at a cost higher than any combination of finite costs,
+   # which stands for leaving the row unassigned.
+   def __init__(self, costs):
+      self.transposed = len(costs) > len(costs[0])
+      if self.transposed:
+         costs = zip(*costs)
+      self.costs = map(list, costs)
+      self.numRows = len(self.costs)
+      self.numCols = len(self.costs[0])
+      self.maxCost = max([ abs(cost) for row in self.costs for cost in row
+                           if cost != INFINITY ] + [0])
+      self.dummyCost = self._dummyCostFor(self.maxCost)
+      numAll = self.numCols + self.numRows
+      self.u = [0.0] * self.numRows
+      self.v = [0.0] * numAll
+      self.colFor = [None] * self.numRows
+      self.rowFor = [None] * numAll
+      self.rowActive = [True] * self.numRows
+      self.colActive = [True] * numAll
+
+   # Assigns every free active row, and returns the current assignment as a
+   # list of (row, col) pairs sorted by row. The assignment has as many pairs
+   # as possible without INFINITY costs, and among those the minimum cost.
+   def solve(self):
+      for row in range(self.numRows):
+         if self.rowActive[row] and self.colFor[row] == None:
+            self._augment(row)
+      return self.pairs()
+
+   # Returns the current assignment as a list of (row, col) pairs sorted by row.
+   def pairs(self):
+      result = [ (row, col) for row, col in enumerate(self.colFor)
+                 if col != None and col < self.numCols ]
+      if self.transposed:
+         result = [ (row, col) for col, row in result ]
+      return sorted(result)
+
+   # Changes the cost of assigning 'row' to 'col'. If the pair is assigned and
+   # the cost changes, the pair is unassigned to be repaired by the next solve.
+   def setCost(self, row, col, cost):
+      row, col = self._internal(row, col)
+      if cost == self.costs[row][col]:
+         return
+      self.costs[row][col] = cost
+      if self.colFor[row] == col:
+         self._unassign(row)
+      if cost != INFINITY and abs(cost) > self.maxCost:
+         self._raiseDummyCost(abs(cost))
+      if cost - self.u[row] - self.v[col] < 0:
+         # Lower the row potential to keep the duals feasible, which makes the
+         # row's assignment (if any) no longer tight.
+         self.u[row] = cost - self.v[col]
+         self._unassign(row)
+
+   # Forbids assigning 'row' to 'col', unassigning the pair if assigned.
+   def forbid(self, row, col):
+      self.setCost(row, col, INFINITY)
+
+   # Makes exactly the given rows and columns active, unassigning any pair with
+   # an inactive row or column.
+   def restrict(self, rows, cols):
+      if self.transposed:
+         rows, cols = cols, rows
+      rows = set(rows)
+      cols = set(cols)
+      for row in range(self.numRows):
+         if row not in rows and self.rowActive[row]:
+            self.rowActive[row] = False
+            self._unassign(row)
+      for col in range(self.numCols):
+         if col not in cols and self.colActive[col]:
+            self.colActive[col] = False
+            if self.rowFor[col] != None:
+               self._unassign(self.rowFor[col])
+      for row in rows:
+         if not self.rowActive[row]:
+            self.rowActive[row] = True
+            self._fixRow(row)
+      for col in cols:
+         if not self.colActive[col]:
+            self.colActive[col] = True
+            self._freeColumns([col])
+
+   # Returns the given external (row, col) pair in internal orientation.
+   def _internal(self, row, col):
+      if self.transposed:
+         return col, row
+      return row, col
+
+   # Returns the cost of assigning internal 'row' to internal column 'col',
+   # which may be a dummy column.
+   def _cost(self, row, col):
+      if col < self.numCols:
+         return self.costs[row][col]
+      return self.dummyCost
+
+   # Returns a dummy column cost higher than the cost of any augmenting path
+   # through finite costs at most 'maxCost' in absolute value, so that leaving
+   # a row unassigned is always worse than assigning one more row.
+   def _dummyCostFor(self, maxCost):
+      return 2.0 * (self.numRows + 1) * (maxCost + 1)
+
+   # Raises the dummy column cost to cover finite costs up to 'maxCost'. Rows
+   # on dummy columns are unassigned, since their assignments are no longer
+   # tight.
+   def _raiseDummyCost(self, maxCost):
+      self.maxCost = maxCost
+      self.dummyCost = self._dummyCostFor(maxCost)
+      for row in range(self.numRows):
+         if self.colFor[row] != None and self.colFor[row] >= self.numCols:
+            self._unassign(row)
+
+   # Unassigns 'row' from its column, if any.
+   def _unassign(self, row):
+      col = self.colFor[row]
+      if col == None:
+         return
+      self.colFor[row] = None
+      self.rowFor[col] = None
+      self._freeColumns([col])
+
+   # Restores optimality conditions for the given newly free columns: a free
+   # column's potential must be 0. Raising it may break feasibility for some
+   # rows, whose potentials are then lowered, unassigning them in turn.
+   def _freeColumns(self, cols):
+      while len(cols) > 0:
+         col = cols.pop()
+         if not self.colActive[col] or self.rowFor[col] != None:
+            continue
+         self.v[col] = 0.0
+         for row in range(self.numRows):
+            cost = self._cost(row, col)
+            if self.rowActive[row] and cost < self.u[row]:
+               self.u[row] = cost
+               assigned = self.colFor[row]
+               if assigned != None:
+                  self.colFor[row] = None
+                  self.rowFor[assigned] = None
+                  cols.append(assigned)
+
+   # Lowers the potential of a reactivated row as needed to keep the duals
+   # feasible.
+   def _fixRow(self, row):
+      for col in range(len(self.v)):
+         if self.colActive[col]:
+            reduced = self._cost(row, col) - self.v[col]
+            if reduced < self.u[row]:
+               self.u[row] = reduced
+
+   # Assigns the free row 'start' by a shortest augmenting path over active
+   # columns, updating potentials.
+   def _augment(self, start):
+      cols = [ col for col in range(len(self.v)) if self.colActive[col] ]
+      minReduced = dict([ (col, INFINITY) for col in cols ])
+      # way[col] is the column before col on its shortest path, or None for
+      # columns reached directly from 'start'.
+      way = {}
+      used = set()
+      usedCols = []
+      row = start
+      prevCol = None
+      while True:
+         rowCosts = self.costs[row]
+         rowPotential = self.u[row]
+         delta = INFINITY
+         nextCol = None
+         for col in cols:
+            if col not in used:
+               cost = rowCosts[col] if col < self.numCols else self.dummyCost
+               reduced = cost - rowPotential - self.v[col]
+               if reduced < minReduced[col]:
+                  minReduced[col] = reduced
+                  way[col] = prevCol
+               if minReduced[col] < delta:
+                  delta = minReduced[col]
+                  nextCol = col
+         self.u[start] += delta
+         for col in usedCols:
+            self.u[self.rowFor[col]] += delta
+            self.v[col] -= delta
+         for col in cols:
+            if col not in used:
+               minReduced[col] -= delta
+         if self.rowFor[nextCol] == None:
+            break
+         used.add(nextCol)
+         usedCols.append(nextCol)
+         row = self.rowFor[nextCol]
+         prevCol = nextCol
+
+      # Augment along the path back to 'start'.
+      col = nextCol
+      while col != None:
+         prev = way[col]
+         row = start if prev == None else self.rowFor[prev]
+         self.rowFor[col] = row
+         self.colFor[row] = col
+         col = prev
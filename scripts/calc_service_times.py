@@ -1,27 +1,51 @@
 from conf import DAY_NAMES
 from data import QueueData
-from sys import argv
-from queue import meanNumberOfWaitingRequests, arrivalRate
-import json
+from sys import argv, exit
+from queue import dayStatistics
 
 # Report correct usage and exit gracefully.
 def usageError():
-   exit('Usage: <request_file_tsv> <week> <day>')
+   exit('Usage: <request_file_tsv> [<week> <day>]')
 
 try:
    filename = argv[1]
-   week = int(argv[2])
-   day = argv[3]
-   if not day in DAY_NAMES:
+   week = int(argv[2]) if len(argv) > 2 else None
+   day = argv[3] if len(argv) > 3 else None
+   if (week == None) != (day == None) or (day != None and not day in DAY_NAMES):
       usageError()
 except:
    usageError()
 
+# Returns a map from queue type to the list of requests of that type in
+# 'requests', plus the key 'all' mapping to all requests.
+def byQueueType(requests):
+   result = { 'all': requests }
+   for req in requests:
+      result.setdefault(req.queue_type, []).append(req)
+   return result
+
+# Returns the statistics line for the given requests: L_s, lambda and
+# L_s / lambda, with undefined values printed as None.
+def statsLine(requests):
+   stats = dayStatistics(requests)
+   if stats == None:
+      return [None, None, None]
+   return [stats['mean_waiting'], stats['arrival_rate'], stats['service_time']]
 
-quotas = json.load(open('data/quotas.txt'))
 data = QueueData(filename).byWeek()
 
-requests = data[week][day]
-L_s = meanNumberOfWaitingRequests(requests)
-lam = arrivalRate(requests)
-print L_s, lam, L_s / lam
+if week != None:
+   print ' '.join(map(str, statsLine(data[week][day])))
+else:
+   # Print a table of statistics for every week, day and queue type.
+   print '\t'.join(['week', 'day', 'queue_type', 'L_s', 'lambda', 'L_s/lambda'])
+   for week in range(len(data)):
+      if data[week] == None:
+         continue
+      for day in DAY_NAMES:
+         types = byQueueType(data[week][day])
+         for queueType in sorted(types):
+            if len(types[queueType]) == 0:
+               continue
+            line = [week, day, queueType] + statsLine(types[queueType])
+            print '\t'.join(map(str, line))
@@ -10,3 +10,6 @@ for day in DAY_NAMES[:-3]:
 HOURS['Friday'] = 6
 HOURS['Saturday'] = 4
 HOURS['Sunday'] = 4
+
+# Queue types requests can be made in, as they appear in the queue_type column.
+QUEUE_TYPES = ['2', '10']
@@ -1,28 +1,26 @@
 from sys import argv
+from stats import VectorStats
 
 print 'reading files:'
 for filename in argv[1:]:
    print '   ' + filename
 
-# Reads a sequence of line-separated floats from the file with given name.
-def toVector(filename):
+# Yields the line-separated floats in the file with given name, one at a time.
+def readValues(filename):
    file = open(filename)
-   res = []
-   for line in file:
-      res.append(float(line))
-   return res
+   try:
+      for line in file:
+         yield float(line)
+   finally:
+      file.close()
 
-# Computes the mean vector of the given array of 'vectors', which the ith 
-# element in the returned vector is the mean of the ith element of each
-# in 'vectors.'
-def mean(vectors):
-   result = []
-   vectLen = len(vectors[0])
-   numVect = len(vectors)
-   for i in range(vectLen):
-      result.append(float(sum([ vectors[j][i] for j in range(numVect) ])) / numVect)
-   return result
+# Streams each file into running per-index statistics, so only one line of one
+# file is held in memory at a time. The ith element of the mean vector is the
+# mean of the ith element of every file that has one.
+stats = VectorStats()
+for filename in argv[1:]:
+   stats.add(readValues(filename))
 
-# Print 
-delays = mean(map(toVector, argv[1:]))
+# Print the mean delay (in minutes) of each request.
+delays = stats.means()
 print map(lambda i : (i + 1, delays[i] / 60), range(len(delays)))
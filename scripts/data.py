@@ -1,5 +1,24 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from conf import KEYS, TIME_KEYS, DAY_NAMES
+from time import sleep
+import instrument, json, mmap, os, struct
+
+# Request fields stored as categorical codes (indices into a category list).
+CATEGORY_KEYS = [ key for key in KEYS if key not in TIME_KEYS ]
+
+# Binary cache files are stored next to the TSV with this suffix, and begin with
+# the magic string, then source file mtime and size, number of requests, and the
+# byte length of the JSON category lists that follow. Categories are arbitrary
+# bytes, stored in the JSON as strings of the latin-1 characters with the same
+# codes.
+CACHE_SUFFIX = '.cache'
+CACHE_MAGIC = 'QDC2'
+CACHE_ENCODING = 'latin-1'
+CACHE_HEADER = '<4sdqqq'
+
+# Struct formats of a single value in time and category code columns.
+TIME_FORMAT = '<q'
+CODE_FORMAT = '<i'
 
 class QueueRequest:
    # Initializes the QueueRequest to store all (key, value) pairs in dict.
@@ -13,45 +32,288 @@ class QueueRequest:
    def __unicode__(self):
       return str(self)
 
-class QueueData:
+class WeekBuckets:
+   # Initializes empty buckets. Requests are added incrementally with add(), and
+   # 'weeks' is always the byWeek() bucketing of all requests added so far: an
+   # array of maps, one map per week (None for weeks without requests). Weeks
+   # start on the day of the first request added, moved back by whole weeks if
+   # earlier requests are added later. Each map is keyed on day names and each
+   # value is a list of requests for that day in the order they were added.
+   def __init__(self):
+      self.first = None
+      self.weeks = []
+
+   # Adds the requests in the given iterable to their week and day buckets.
+   def add(self, requests):
+      for req in requests:
+         if self.first == None:
+            self.first = datetime.combine(req.time_in.date(), datetime.min.time())
+         delta = req.time_in - self.first
+         if delta.days < 0:
+            # Move the start back by whole weeks so day names keep their place.
+            shift = (-delta.days - 1) / len(DAY_NAMES) + 1
+            self.first -= timedelta(days=shift * len(DAY_NAMES))
+            self.weeks = [None] * shift + self.weeks
+            delta = req.time_in - self.first
+         day = DAY_NAMES[delta.days % len(DAY_NAMES)]
+         week = delta.days / len(DAY_NAMES)
+         while len(self.weeks) <= week:
+            self.weeks.append(None)
+         if self.weeks[week] == None:
+            # Initialize a new week map.
+            self.weeks[week] = {}
+            for dayName in DAY_NAMES:
+               self.weeks[week][dayName] = []
+         self.weeks[week][day].append(req)
+
+# Returns the name byWeek() gives the day of the given date, where 'origin' is
+# the date of the first request added to the buckets (named DAY_NAMES[0]).
+def dayName(date, origin):
+   return DAY_NAMES[(date - origin).days % len(DAY_NAMES)]
+
+# Returns a QueueRequest based on the tab separated data in line, assuming
+# request fields are ordered as in KEYS. TIME_KEYS are parsed as datetimes.
+# Returns None for lines without both times.
+def parseLine(line):
+   parts = line.rstrip('\r\n').split('\t', len(KEYS) - 1)
+   if len(parts) < len(TIME_KEYS):
+      return None
+   result = {}
+   for i in range(len(parts)):
+      result[KEYS[i]] = parts[i]
+   for key in TIME_KEYS:
+      result[key] = datetime.fromtimestamp(int(result[key]))
+   return QueueRequest(result)
+
+# Yields lists of at most 'chunkSize' QueueRequests read from the tab separated
+# file, skipping the first line of column labels. If 'follow' is true, keeps
+# watching the file after reaching its end, polling every 'interval' seconds,
+# and yields requests from lines appended to it as they arrive, so chunks may
+# be smaller than 'chunkSize'. Incomplete last lines are held back until they
+# are finished.
+def streamRequests(filename, chunkSize=1000, follow=False, interval=1.0):
+   file = open(filename)
+   try:
+      file.readline()
+      chunk = []
+      partial = ''
+      while True:
+         line = file.readline()
+         if line.endswith('\n') or (line != '' and not follow):
+            req = parseLine(partial + line)
+            partial = ''
+            if req != None:
+               chunk.append(req)
+            if len(chunk) == chunkSize:
+               yield chunk
+               chunk = []
+            continue
+         partial += line
+         if len(chunk) > 0:
+            yield chunk
+            chunk = []
+         if not follow:
+            return
+         sleep(interval)
+   finally:
+      file.close()
+
+class MappedColumn:
+   # A read-only sequence of 'length' values in 'buffer' starting at byte
+   # 'offset', each packed with the single value struct 'format'. Values are
+   # unpacked on access, so the buffer (typically an mmap) is never copied.
+   def __init__(self, buffer, offset, length, format):
+      self.buffer = buffer
+      self.offset = offset
+      self.length = length
+      self.format = format
+      self.size = struct.calcsize(format)
+
+   def __len__(self):
+      return self.length
+
+   def __getitem__(self, i):
+      if isinstance(i, slice):
+         return [ self[j] for j in range(*i.indices(self.length)) ]
+      if i < 0:
+         i += self.length
+      if i < 0 or i >= self.length:
+         raise IndexError('column index out of range')
+      return struct.unpack_from(self.format, self.buffer,
+                                self.offset + i * self.size)[0]
+
+   # Iterates over values, unpacking them in chunks.
+   def __iter__(self, chunk=4096):
+      for start in range(0, self.length, chunk):
+         count = min(chunk, self.length - start)
+         format = self.format[0] + str(count) + self.format[1:]
+         for value in struct.unpack_from(format, self.buffer,
+                                         self.offset + start * self.size):
+            yield value
+
+class QueueData(object):
    # Initializes the QueueData store with the contents of the tab separated
-   # file, using the first line of the file as column labels.
-   def __init__(self, filename):
-      lines = list(open(filename))
-      keys = lines[0].strip().split('\t')
-      self.requests = map(self._parseLine, lines[1:])
+   # file, skipping the first line of column labels. Requests are stored in
+   # columns: epoch seconds for TIME_KEYS and category codes for the other
+   # KEYS. Unless 'cache' is false, columns are saved to a binary cache file
+   # next to the TSV, and later loads of an unchanged TSV memory-map the cache
+   # instead of parsing.
+   def __init__(self, filename, cache=True):
+      self.filename = filename
+      self._requests = None
+      with instrument.phase('load_data'):
+         if not (cache and self._loadCache()):
+            with instrument.phase('parse'):
+               self._parse()
+            if cache:
+               self._writeCache()
+               self._loadCache()
+
+   # Returns the number of requests.
+   def __len__(self):
+      return len(self.time_in)
+
+   # Returns a QueueRequest view of the request at index i, with TIME_KEYS as
+   # datetimes and the other KEYS as strings. The view's 'index' attribute is i.
+   def request(self, i):
+      fields = { 'index': i }
+      fields['time_in'] = datetime.fromtimestamp(self.time_in[i])
+      fields['time_out'] = datetime.fromtimestamp(self.time_out[i])
+      for key in CATEGORY_KEYS:
+         fields[key] = self.categories[key][self.codes[key][i]]
+      return QueueRequest(fields)
+
+   # The list of QueueRequest views of all requests, built on first access.
+   @property
+   def requests(self):
+      if self._requests == None:
+         self._requests = map(self.request, range(len(self)))
+      return self._requests
 
    # Returns an array of maps, one map per week starting at the beginning of the
    # data set. Each map is keyed on day names and each value is a list of
    # requests for that day sorted on request time.
    def byWeek(self):
-      # Start at the beginning of the first day.
-      first = datetime.combine(self.requests[0].time_in.date(), datetime.min.time())
-      last = self.requests[len(self.requests) - 1].time_in
-      buckets = [None] * ((last - first).days / len(DAY_NAMES) + 1)
-      for req in self.requests:
-         delta = req.time_in - first
-         day = DAY_NAMES[delta.days % len(DAY_NAMES)]
-         week = delta.days / len(DAY_NAMES)
-         if buckets[week] == None:
-            # Initialize a new week map.
-            buckets[week] = {}
-            for dayName in DAY_NAMES:
-               buckets[week][dayName] = []
-         buckets[week][day].append(req)
-      return buckets
-
-   # Returns a QueueRequest based on the tab separated data in lines, assuming
-   # request fields are ordered as in KEYS. TIME_KEYS are parsed as datetimes.
-   def _parseLine(self, line):
-      result = {}
-      parts = line.strip().split('\t')
-      for i in range(len(parts)):
-         result[KEYS[i]] = parts[i]
-      for key in TIME_KEYS:
-         result[key] = datetime.fromtimestamp(int(result[key]))
-      return QueueRequest(result)
-
-   # Returns an iterator or the requests list.
+      with instrument.phase('by_week'):
+         buckets = WeekBuckets()
+         buckets.add(self)
+      return buckets.weeks
+
+   # Returns the date of the first request, the day byWeek() names
+   # DAY_NAMES[0], or None if there are no requests.
+   def origin(self):
+      if len(self) == 0:
+         return None
+      return datetime.fromtimestamp(self.time_in[0]).date()
+
+   # Returns an iterator over the requests.
    def __iter__(self):
-      return self.requests.__iter__()
+      if self._requests != None:
+         return self._requests.__iter__()
+      return (self.request(i) for i in xrange(len(self)))
+
+   # Parses the TSV into in-memory columns, assuming request fields are ordered
+   # as in KEYS.
+   def _parse(self):
+      self.time_in = []
+      self.time_out = []
+      self.codes = dict([ (key, []) for key in CATEGORY_KEYS ])
+      self.categories = dict([ (key, []) for key in CATEGORY_KEYS ])
+      lookup = dict([ (key, {}) for key in CATEGORY_KEYS ])
+      file = open(self.filename)
+      file.readline()
+      for line in file:
+         parts = line.rstrip('\r\n').split('\t', len(KEYS) - 1)
+         if len(parts) < len(TIME_KEYS):
+            continue
+         parts += [''] * (len(KEYS) - len(parts))
+         self.time_in.append(int(parts[0]))
+         self.time_out.append(int(parts[1]))
+         for i in range(len(TIME_KEYS), len(KEYS)):
+            key = KEYS[i]
+            code = lookup[key].get(parts[i])
+            if code == None:
+               code = lookup[key][parts[i]] = len(self.categories[key])
+               self.categories[key].append(parts[i])
+            self.codes[key].append(code)
+      file.close()
+
+   # Returns the path of the binary cache file for this TSV.
+   def _cachePath(self):
+      return self.filename + CACHE_SUFFIX
+
+   # Writes the in-memory columns to the binary cache file. Failure to write
+   # the cache (e.g. in a read-only directory) is ignored.
+   def _writeCache(self):
+      stat = os.stat(self.filename)
+      categories = json.dumps(dict([ (key, [ category.decode(CACHE_ENCODING)
+                                             for category in values ])
+                                     for key, values in self.categories.items() ]))
+      count = len(self.time_in)
+      header = struct.pack(CACHE_HEADER, CACHE_MAGIC, stat.st_mtime,
+                           stat.st_size, count, len(categories))
+      try:
+         file = open(self._cachePath(), 'wb')
+         try:
+            file.write(header)
+            file.write(categories)
+            file.write('\0' * self._padding(len(header) + len(categories)))
+            for column in [self.time_in, self.time_out]:
+               file.write(struct.pack('<%dq' % count, *column))
+            for key in CATEGORY_KEYS:
+               file.write(struct.pack('<%di' % count, *self.codes[key]))
+         finally:
+            file.close()
+      except (IOError, OSError):
+         pass
+
+   # Memory-maps the binary cache file and replaces columns with views of it.
+   # Returns false, leaving columns untouched, if no cache file matches the
+   # current TSV.
+   def _loadCache(self):
+      try:
+         stat = os.stat(self.filename)
+         file = open(self._cachePath(), 'rb')
+      except (IOError, OSError):
+         return False
+      try:
+         headerSize = struct.calcsize(CACHE_HEADER)
+         header = file.read(headerSize)
+         if len(header) < headerSize:
+            return False
+         magic, mtime, size, count, length = struct.unpack(CACHE_HEADER, header)
+         if (magic, mtime, size) != (CACHE_MAGIC, stat.st_mtime, stat.st_size):
+            return False
+         categories = json.loads(file.read(length))
+         offset = headerSize + length + self._padding(headerSize + length)
+         expected = offset + count * (2 * struct.calcsize(TIME_FORMAT) +
+                                      len(CATEGORY_KEYS) * struct.calcsize(CODE_FORMAT))
+         if os.fstat(file.fileno()).st_size != expected:
+            return False
+         if count == 0:
+            buffer = ''
+         else:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+      finally:
+         file.close()
+
+      # Returns a view of the next column in the cache.
+      def nextColumn(format):
+         column = MappedColumn(buffer, nextColumn.offset, count, format)
+         nextColumn.offset += count * column.size
+         return column
+      nextColumn.offset = offset
+      self.time_in = nextColumn(TIME_FORMAT)
+      self.time_out = nextColumn(TIME_FORMAT)
+      self.codes = {}
+      self.categories = {}
+      for key in CATEGORY_KEYS:
+         self.codes[key] = nextColumn(CODE_FORMAT)
+         self.categories[key] = [ category.encode(CACHE_ENCODING)
+                                  for category in categories[key] ]
+      return True
+
+   # Returns the number of zero bytes needed after 'length' bytes to align the
+   # columns that follow on 8 byte boundaries.
+   def _padding(self, length):
+      return -length % 8
@@ -0,0 +1,113 @@
+from sys import argv, exit
+from data import QueueData
+from queue import eventSeconds
+from slots import SLOTS
+from simulation import meanHelpTime
+import json
+
+# Number of seconds after midnight at which the first hour of every day starts,
+# as in the simulator.
+OPENING = 12 * 3600
+
+# Returns a map from each day of the week to the list of mean request arrival
+# rates (requests per second) during each of its hours, averaged over the weeks
+# in the buckets 'byWeek' (from QueueData.byWeek) that have requests that day.
+# Requests made outside of the day's hours are not counted.
+def hourlyArrivalRates(byWeek):
+   counts = dict([ (day, [0] * SLOTS.hours[day]) for day in SLOTS.days ])
+   daysSeen = dict([ (day, 0) for day in SLOTS.days ])
+   for week in byWeek:
+      if week == None:
+         continue
+      for day in SLOTS.days:
+         if len(week[day]) == 0:
+            continue
+         daysSeen[day] += 1
+         for seconds in eventSeconds(week[day])[0]:
+            hour = (seconds - OPENING) / 3600
+            if 0 <= hour < SLOTS.hours[day]:
+               counts[day][hour] += 1
+   return dict([ (day, [ float(n) / 3600 / max(1, daysSeen[day])
+                         for n in counts[day] ])
+                 for day in SLOTS.days ])
+
+# Returns the Erlang C probability that a request has to wait in an M/M/c queue
+# with 'servers' servers and offered load 'load' (arrival rate times mean
+# service time). The probability is 1 if the load is not below the number of
+# servers.
+def erlangC(servers, load):
+   if load >= servers:
+      return 1.0
+   # Erlang B by its recurrence, which stays within floating point range.
+   blocking = 1.0
+   for k in range(1, servers + 1):
+      blocking = load * blocking / (k + load * blocking)
+   return servers * blocking / (servers - load * (1 - blocking))
+
+# Returns the expected wait (in seconds) in an M/M/c queue with the given
+# number of servers, arrival rate (per second) and mean service time (in
+# seconds), or None if the queue is unstable.
+def expectedWait(servers, arrivalRate, serviceTime):
+   load = arrivalRate * serviceTime
+   if load >= servers:
+      return None
+   return erlangC(servers, load) * serviceTime / (servers - load)
+
+# Returns the smallest number of servers, at least 'minimum', for which the
+# expected wait in an M/M/c queue with the given arrival rate and service time
+# is at most 'targetWait' seconds.
+def minimumServers(arrivalRate, serviceTime, targetWait, minimum=1):
+   load = arrivalRate * serviceTime
+   if load == 0:
+      return minimum
+   # Extend the Erlang B recurrence one server at a time.
+   blocking = 1.0
+   servers = 0
+   while True:
+      servers += 1
+      blocking = load * blocking / (servers + load * blocking)
+      if servers >= minimum and load < servers:
+         waiting = servers * blocking / (servers - load * (1 - blocking))
+         if waiting * serviceTime / (servers - load) <= targetWait:
+            return servers
+
+# Returns quotas in the shape of data/quotas.txt: a dict with keys 'total' and
+# 'senior', each mapping each day of the week to a list of TA counts per hour.
+# Total counts are the minimum to keep the expected wait at most 'targetWait'
+# seconds given 'rates' (as returned by hourlyArrivalRates) and 'serviceTime',
+# and at least 'senior', the senior count of every hour.
+def erlangQuotas(rates, serviceTime, targetWait, senior=1):
+   total = dict([ (day, [ minimumServers(rate, serviceTime, targetWait, senior)
+                          for rate in rates[day] ])
+                  for day in SLOTS.days ])
+   seniors = dict([ (day, [senior] * SLOTS.hours[day]) for day in SLOTS.days ])
+   return { 'total': total, 'senior': seniors }
+
+# Returns the mean service time (in seconds) of a request in the simulator,
+# weighting each queue type by its share of 'requests'.
+def meanServiceTime(requests):
+   return sum([ meanHelpTime(req.queue_type) for req in requests ]) / len(requests)
+
+# Report correct usage and exit gracefully.
+def usageError():
+   exit('Usage: <request_file_tsv> <target_wait_minutes> [service_minutes] ' +
+        '[output_file]')
+
+if __name__ == '__main__':
+   try:
+      filename = argv[1]
+      targetWait = float(argv[2]) * 60
+      serviceTime = float(argv[3]) * 60 if len(argv) > 3 else None
+      output = argv[4] if len(argv) > 4 else None
+   except:
+      usageError()
+
+   data = QueueData(filename)
+   if serviceTime == None:
+      serviceTime = meanServiceTime(data.requests)
+   quotas = erlangQuotas(hourlyArrivalRates(data.byWeek()), serviceTime,
+                         targetWait)
+   if output == None:
+      print json.dumps(quotas)
+   else:
+      json.dump(quotas, open(output, 'w'))
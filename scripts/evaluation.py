@@ -1,41 +1,92 @@
+from itertools import compress
+
+# Returns the boolean TA x slot assignment matrix of a schedule given as a list
+# with one list of scheduled TAs per slot (as built by existing.py and lp.py).
+# The matrix is a list of one bytearray per TA, with a 1 for each slot the TA
+# is scheduled for.
+def matrixFromSlotLists(schedule, numTas):
+    matrix = [ bytearray(len(schedule)) for ta in range(numTas) ]
+    for slot in range(len(schedule)):
+        for ta in schedule[slot]:
+            matrix[ta][slot] = 1
+    return matrix
+
+# Returns the boolean TA x slot assignment matrix of a schedule given as a list
+# with one list of scheduled slots per TA (as built by hungarian.sage).
+def matrixFromTALists(schedule, numSlots):
+    matrix = [ bytearray(numSlots) for ta in range(len(schedule)) ]
+    for ta in range(len(schedule)):
+        for slot in schedule[ta]:
+            matrix[ta][slot] = 1
+    return matrix
+
 # Returns the total adherence to the preferences of given ta.
-def ta_adherence(ta):
-    def satisfied_preference(slot):
-        return PARAMS['ta_preference'][ta][slot] * int(ta in schedule[slot])
-    return sum([ satisfied_preference(i) for i in range(len(schedule)) ])
+def ta_adherence(matrix, ta, params):
+    return sum(compress(params['ta_preference'][ta], matrix[ta]))
 
 # Returns the total adherence to all preferences of all tas in given schedule.
-def total_adherence(schedule):
-    return sum([ ta_adherence(i) for i in tas ])
+def total_adherence(matrix, params):
+    return evaluate(matrix, params)['total_adherence']
 
 # Returns the total weighted adherence to all preferences of all tas in given
 # schedule where each ta adherence total is scaled by that ta's number of
 # quarters taught.
-def total_weighted_adherence(schedule):
-    return sum([ PARAMS['quarters_taught'][i] * ta_adherence(i) for i in tas ])
+def total_weighted_adherence(matrix, params):
+    return evaluate(matrix, params)['total_weighted_adherence']
 
 # Returns the number of slots scheduled for seniors in the given schedule.
-def seniors_scheduled(schedule):
-    def numSeniors(working):
-        return len(filter(PARAMS['is_senior'], working))
-    return sum(map(lambda slot : numSeniors(slot), schedule))
+def seniors_scheduled(matrix, params):
+    return evaluate(matrix, params)['seniors_scheduled']
 
 # Returns the number of slots scheduled for regular tas in the given schedule.
-def regular_scheduled(schedule):
-    def numSeniors(working):
-        return len(working)
-    return sum(map(lambda slot : numSeniors(slot), schedule )) - seniors_scheduled(schedule)
+def regular_scheduled(matrix, params):
+    return evaluate(matrix, params)['regular_scheduled']
 
 # The mean satisfied preference value across all assigned slots in the schedule.
 # Formally, this is the mean value of the set of all {a_ij : x_ij = 1}. filterFn
 # takes one argument, a ta, and returns true if that ta's assigned slot should
 # be considered.
-def mean_pref(filterFn, schedule):
-    prefs_satisfied = []
-    total = 0
-    for slot in range(len(schedule)):
-        consider = filter(filterFn, schedule[slot])
-        total += len(consider)
-        for ta in consider:
-            prefs_satisfied.append(PARAMS['ta_preference'][ta][slot])
-    return sum(prefs_satisfied) / total
\ No newline at end of file
+def mean_pref(filterFn, matrix, params):
+    tas = filter(filterFn, range(len(matrix)))
+    total = sum([ sum(matrix[ta]) for ta in tas ])
+    return sum([ ta_adherence(matrix, ta, params) for ta in tas ]) / total
+
+# Returns a dict of all the above metrics for the given assignment matrix,
+# computed from one pass of per-TA row reductions (hours scheduled and
+# preference adherence). Keys are the metric function names, with mean_pref
+# split into 'mean_pref_senior' and 'mean_pref_regular'.
+def evaluate(matrix, params):
+    hours = [ sum(row) for row in matrix ]
+    adherence = [ ta_adherence(matrix, ta, params) for ta in range(len(matrix)) ]
+    senior = map(params['is_senior'], range(len(matrix)))
+
+    # Returns the sum of values over senior (or regular) TAs.
+    def sumWhere(values, isSenior):
+        return sum([ values[ta] for ta in range(len(matrix))
+                     if senior[ta] == isSenior ])
+
+    # Returns the mean preference over the slots of senior (or regular) TAs.
+    def meanWhere(isSenior):
+        total = sumWhere(hours, isSenior)
+        return sumWhere(adherence, isSenior) / total if total > 0 else None
+
+    quarters = params['quarters_taught']
+    return {
+        'total_adherence': sum(adherence),
+        'total_weighted_adherence': sum([ quarters[ta] * adherence[ta]
+                                          for ta in range(len(matrix)) ]),
+        'seniors_scheduled': sumWhere(hours, True),
+        'regular_scheduled': sumWhere(hours, False),
+        'mean_pref_senior': meanWhere(True),
+        'mean_pref_regular': meanWhere(False)
+    }
+
+# Returns a list of metric dicts as returned by evaluate, one per schedule in
+# 'schedules'. Schedules are lists with one list of TAs per slot if bySlot is
+# true, and lists with one list of slots per TA otherwise.
+def evaluateBatch(schedules, params, bySlot=True):
+    if bySlot:
+        toMatrix = lambda s : matrixFromSlotLists(s, params['num_tas'])
+    else:
+        toMatrix = lambda s : matrixFromTALists(s, params['num_time_slots'])
+    return [ evaluate(toMatrix(schedule), params) for schedule in schedules ]
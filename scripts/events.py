@@ -0,0 +1,27 @@
+import heapq
+
+class EventCalendar:
+   # Initializes an empty calendar with the virtual clock set to 'start'
+   # seconds.
+   def __init__(self, start=0):
+      self.now = start
+      self.events = []
+      self.count = 0
+
+   # Schedules fn(*args) to be called when the virtual clock reaches 'time'.
+   # Events scheduled for the same time fire in the order they were scheduled.
+   def schedule(self, time, fn, *args):
+      heapq.heappush(self.events, (time, self.count, fn, args))
+      self.count += 1
+
+   # Returns true if no events are left to fire, false otherwise.
+   def empty(self):
+      return len(self.events) == 0
+
+   # Fires events in time order, advancing the virtual clock to each event's
+   # time, until no events are left. Events may schedule further events.
+   def run(self):
+      while len(self.events) > 0:
+         time, count, fn, args = heapq.heappop(self.events)
+         self.now = time
+         fn(*args)
@@ -1,66 +1,63 @@
+from problem import getConfig
+from scheduling import ScheduleState, Counters, PreferenceQueues
+
+PARAMS = getConfig()
+
 tas = range(len(PARAMS['ta_preference']))
-seniors = filter(lambda ta : PARAMS['is_senior'](PARAMS['quarters_taught'][ta]), tas)
-senior_quotas = PARAMS['min_required_senior']
+seniors = filter(PARAMS['is_senior'], tas)
+senior_quotas = Counters(PARAMS['min_required_senior'])
 total_quotas = PARAMS['min_required_total']
-regular_quotas = map(lambda i : total_quotas[i] - senior_quotas[i], range(len(total_quotas)))
-
-schedule = [ [] for i in total_quotas ]
-to_place = [PARAMS['min_hours_per_ta']] * len(tas)
+regular_quotas = Counters(map(lambda i : total_quotas[i] - senior_quotas[i], range(len(total_quotas))))
 
-# Returns true if all elements of l are 0, false otherwise.
-def all_zero(l):
-    return len(filter(lambda val : val != 0, l)) == 0
+state = ScheduleState(len(tas), len(total_quotas))
+to_place = Counters([PARAMS['min_hours_per_ta']] * len(tas))
 
-# Returns the index of the first non-zero element in l.
-def first_non_zero(l):
-    if all_zero(l):
-        raise ValueError()
-    i = 0
-    while l[i] == 0:
-        i += 1
-    return i
+# Slots in order of preference for each TA, and seniors in order of preference
+# for each slot.
+slot_choices = PreferenceQueues(PARAMS['ta_preference'])
+senior_choices = PreferenceQueues(zip(*PARAMS['ta_preference']), seniors)
 
 # Adds the ta to the given slot in the schedule.
 def add_to_schedule(ta, slot):
-    schedule[slot].append(ta)
+    state.add(ta, slot)
 
-# Assigns the ta with prefs to their top choice available, respecting quotas
-# only if a quotas list is provided.
-def make_best_choice(prefs, ta, quotas=None):
-    choices = sorted(zip(range(len(prefs)), prefs), key=lambda pair : pair[1])
-    choices = filter(lambda val : val != 0, choices)
-    while len(choices) > 0:
-        slot, pref = choices.pop()
-        if (quotas == None or quotas[slot] > 0) and ta not in schedule[slot]:
-            add_to_schedule(ta, slot)
-            if quotas != None:
-                quotas[slot] -= 1
-            return True
-    return False
+# Assigns the ta to their top choice available from choices, respecting quotas
+# only if a quotas Counters is provided. Slots skipped as unavailable are not
+# considered for this ta again.
+def make_best_choice(choices, ta, quotas=None):
+    def available(slot):
+        return (quotas == None or quotas[slot] > 0) and not state.has(ta, slot)
+    slot = choices.best(ta, available)
+    if slot == None:
+        return False
+    choices.take(ta)
+    add_to_schedule(ta, slot)
+    if quotas != None:
+        quotas.decrement(slot)
+    return True
 
 # Returns the index of the best senior for the spot (the one who prefers it
 # most and is eligible).
 def find_best_senior(slot):
-    # only consider seniors that are not already working minimum hours
-    best = filter(lambda ta : to_place[ta] > 0, seniors)
-    # who are not already scheduled in this slot
-    best = filter(lambda ta : not ta in schedule[slot], best)
-    # sorted by preference
-    best = zip(best, map(lambda s : PARAMS['ta_preference'][s][slot], best))
-    best = sorted(best, key=lambda pair : pair[1])
-    if len(best) == 0:
+    # only consider seniors that are not already working minimum hours who are
+    # not already scheduled in this slot
+    def eligible(ta):
+        return to_place[ta] > 0 and not state.has(ta, slot)
+    best = senior_choices.best(slot, eligible)
+    if best == None:
         raise ValueError('Cannot fill senior slot.')
-    return best[-1][0]
+    senior_choices.take(slot)
+    return best
 
-def attempt_place(ta, quotas=None):
-    return make_best_choice(PARAMS['ta_preference'][ta], ta, quotas)
+def attempt_place(ta, choices, quotas=None):
+    return make_best_choice(choices, ta, quotas)
 
 # Fill senior slots.
-while not all_zero(senior_quotas):
-    slot = first_non_zero(senior_quotas)
+while not senior_quotas.allZero():
+    slot = senior_quotas.firstNonZero()
     ta = find_best_senior(slot)
-    senior_quotas[slot] -= 1
-    to_place[ta] -= 1
+    senior_quotas.decrement(slot)
+    to_place.decrement(ta)
     add_to_schedule(ta, slot)
 
 # Fill all other slots two hours at a time, letting TAs choose by seniority.
@@ -68,16 +65,21 @@ tas.sort(lambda x, y : PARAMS['quarters_taught'][y] -
                        PARAMS['quarters_taught'][x])
 print tas, map(lambda ta : PARAMS['quarters_taught'][ta], tas)
 for ta in tas:
-    if to_place[ta] > 0 and attempt_place(ta, regular_quotas): to_place[ta] -= 1
-    if to_place[ta] > 0 and attempt_place(ta, regular_quotas): to_place[ta] -= 1
+    if to_place[ta] > 0 and attempt_place(ta, slot_choices, regular_quotas): to_place.decrement(ta)
+    if to_place[ta] > 0 and attempt_place(ta, slot_choices, regular_quotas): to_place.decrement(ta)
 
-# Fill in surplus wherever the TAs would like it.
+# Fill in surplus wherever the TAs would like it. Slots skipped above for lack
+# of quota are available again, so start from fresh preference queues.
 for ta in tas:
-    to_place[ta] = max(0, PARAMS['max_hours_per_ta'](ta) -
-                          PARAMS['min_hours_per_ta'])
-while not all_zero(to_place):
-    ta = first_non_zero(to_place)
-    if attempt_place(ta):
-        to_place[ta] -= 1
+    to_place.set(ta, max(0, PARAMS['max_hours_per_ta'](ta) -
+                            PARAMS['min_hours_per_ta']))
+extra_choices = PreferenceQueues(PARAMS['ta_preference'])
+while not to_place.allZero():
+    ta = to_place.firstNonZero()
+    if attempt_place(ta, extra_choices):
+        to_place.decrement(ta)
     else:
         print 'No extra slot available.'
+        to_place.set(ta, 0)
+
+schedule = state.slotLists()
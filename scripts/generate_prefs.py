@@ -1,15 +1,26 @@
 from sys import argv
 from preferences import getRandomTAPreferenceMap, serialize
+from preferences import PreferenceGenerator, writePreferenceMatrix
 from json import dumps
 
+# Usage: [num_tas] [output_file.bin [seed]]. Without an output file, prints
+# one JSON blob of preference rows. With one, rows are drawn in bulk and
+# streamed to the binary file, which the configuration reads in place of
+# prefs.txt if it is named prefs.bin.
 NUM_TAS = 10
 try:
    NUM_TAS = int(argv[1])
 except:
    pass
 
-tas = []
-for i in range(NUM_TAS):
-   prefMap = getRandomTAPreferenceMap()
-   tas.append(serialize(prefMap))
-print dumps({'prefs': tas})
+if len(argv) > 2:
+   seed = int(argv[3]) if len(argv) > 3 else None
+   generator = PreferenceGenerator(seed)
+   writePreferenceMatrix(argv[2], generator.rows(NUM_TAS), NUM_TAS,
+                         generator.numSlots)
+else:
+   tas = []
+   for i in range(NUM_TAS):
+      prefMap = getRandomTAPreferenceMap()
+      tas.append(serialize(prefMap))
+   print dumps({'prefs': tas})
@@ -0,0 +1,155 @@
+from time import time
+import atexit, json, os
+
+# Setting this environment variable to a file path turns instrumentation on for
+# the whole process. The report is written to that path at exit, as JSON, or
+# as collapsed stacks (one 'phase;subphase microseconds' line per phase, for
+# flame graph tools) if the path ends with COLLAPSED_SUFFIX.
+ENVIRONMENT_VARIABLE = 'QUEUE_INSTRUMENT'
+COLLAPSED_SUFFIX = '.folded'
+
+class Instruments:
+   # Initializes empty counters, histograms and phase timers.
+   def __init__(self):
+      self.counters = {}
+      self.histograms = {}
+      self.levels = {}
+      self.phases = {}
+      self.stack = []
+
+   # Adds n to the counter with given name.
+   def count(self, name, n=1):
+      self.counters[name] = self.counters.get(name, 0) + n
+
+   # Adds the value to the histogram with given name, with given weight.
+   def observe(self, name, value, weight=1):
+      histogram = self.histograms.setdefault(name, {})
+      histogram[value] = histogram.get(value, 0) + weight
+
+   # Records that the quantity with given name (such as a queue length) has
+   # the given value from simulation time 'now' on. The previous value is added
+   # to the histogram of the quantity, weighted by how long it lasted. A time
+   # earlier than the previous one starts a new run of the simulation clock.
+   def level(self, name, value, now):
+      if name in self.levels:
+         last, since = self.levels[name]
+         if now > since:
+            self.observe(name, last, now - since)
+      self.levels[name] = (value, now)
+
+   # Returns a context manager timing the block it guards as a phase with given
+   # name, nested in the phases around it.
+   def phase(self, name):
+      return _Phase(self, name)
+
+   # Returns the mean of the histogram with given name, or None if it is empty.
+   def mean(self, name):
+      histogram = self.histograms.get(name, {})
+      total = sum(histogram.values())
+      if total == 0:
+         return None
+      return float(sum([ v * w for v, w in histogram.items() ])) / total
+
+   # Returns the report of everything recorded so far as a dict with keys
+   # 'counters', 'histograms' (with means), 'phases' (seconds per nested phase
+   # path) and 'utilisation' (the mean fraction of TAs on shift who are busy,
+   # if the simulator was instrumented).
+   def report(self):
+      histograms = {}
+      for name, histogram in self.histograms.items():
+         histograms[name] = { 'mean': self.mean(name),
+                              'weights': dict([ (str(v), w) for v, w
+                                                in sorted(histogram.items()) ]) }
+      utilisation = None
+      busy = self.mean('busy_tas')
+      present = self.mean('present_tas')
+      if busy != None and present:
+         utilisation = busy / present
+      return { 'counters': self.counters, 'histograms': histograms,
+               'phases': dict([ (';'.join(path), seconds)
+                                for path, seconds in self.phases.items() ]),
+               'utilisation': utilisation }
+
+   # Writes the report as JSON to the named file.
+   def dumpJSON(self, filename):
+      with open(filename, 'w') as file:
+         json.dump(self.report(), file, indent=1, sort_keys=True)
+
+   # Writes the phase timings to the named file as collapsed stacks, with the
+   # time spent in each phase itself (excluding nested phases) in
+   # microseconds.
+   def dumpCollapsed(self, filename):
+      with open(filename, 'w') as file:
+         for path in sorted(self.phases):
+            nested = sum([ seconds for other, seconds in self.phases.items()
+                           if len(other) == len(path) + 1
+                           and other[:-1] == path ])
+            own = int(round((self.phases[path] - nested) * 1e6))
+            file.write('{0} {1}\n'.format(';'.join(path), max(0, own)))
+
+class _Phase:
+   def __init__(self, instruments, name):
+      self.instruments = instruments
+      self.name = name
+
+   def __enter__(self):
+      self.instruments.stack.append(self.name)
+      self.start = time()
+
+   def __exit__(self, type, value, traceback):
+      elapsed = time() - self.start
+      path = tuple(self.instruments.stack)
+      self.instruments.stack.pop()
+      self.instruments.phases[path] = self.instruments.phases.get(path, 0) + elapsed
+
+class _NoPhase:
+   def __enter__(self):
+      pass
+
+   def __exit__(self, type, value, traceback):
+      pass
+
+# The process's Instruments if instrumentation is on, None otherwise. Hot paths
+# should fetch it once and test it against None before recording anything.
+current = None
+
+_noPhase = _NoPhase()
+
+# Returns true if instrumentation is on.
+def enabled():
+   return current != None
+
+# Returns a context manager timing the block it guards as a phase with given
+# name if instrumentation is on, and doing nothing otherwise.
+def phase(name):
+   if current == None:
+      return _noPhase
+   return current.phase(name)
+
+# Adds n to the counter with given name if instrumentation is on.
+def count(name, n=1):
+   if current != None:
+      current.count(name, n)
+
+# Turns instrumentation on, and returns the process's Instruments. If given,
+# the report is written to the file 'output' when the process exits.
+def enable(output=None):
+   global current
+   if current == None:
+      current = Instruments()
+      if output != None:
+         atexit.register(_dump, current, output, os.getpid())
+   return current
+
+# Writes the report of 'instruments' to the file 'output' if this is the
+# process 'pid' that turned instrumentation on, not a forked worker.
+def _dump(instruments, output, pid):
+   if os.getpid() != pid:
+      return
+   if output.endswith(COLLAPSED_SUFFIX):
+      instruments.dumpCollapsed(output)
+   else:
+      instruments.dumpJSON(output)
+
+if os.environ.get(ENVIRONMENT_VARIABLE):
+   enable(os.environ[ENVIRONMENT_VARIABLE])
@@ -0,0 +1,15 @@
+from problem import getConfig
+from milp import scheduleModel, scheduleFromSolution, defaultSolver
+
+PARAMS = getConfig()
+
+# Build the same integer program as lp.sage in sparse form, and solve it with
+# scipy if it is installed or the bundled branch and bound solver otherwise.
+model, pairs = scheduleModel(PARAMS)
+value, x = defaultSolver().solve(model)
+
+# Print solution schedule assignment.
+print 'Objective Value:', value
+schedule = scheduleFromSolution(x, pairs, PARAMS['num_time_slots'])
+for s in range(len(schedule)):
+    print s, PARAMS['slots'].label(s), schedule[s]
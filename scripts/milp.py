@@ -0,0 +1,360 @@
+import math
+
+try:
+   from scipy.optimize import milp as scipyMilp, LinearConstraint, Bounds
+   from scipy.sparse import coo_matrix
+except ImportError:
+   scipyMilp = None
+
+# Tolerance for treating floating point values as zero or integral.
+EPSILON = 1e-9
+
+# Number of consecutive pivots without objective progress after which the
+# simplex method switches to Bland's rule to avoid cycling.
+DEGENERATE_PIVOTS = 50
+
+# Number of variables priced before the simplex method settles for the best
+# entering candidate seen so far.
+PRICING_BLOCK = 200
+
+class Model:
+   # Initializes a mixed integer linear program over 'numVars' variables:
+   # maximize the sum of objective[j] * x[j] subject to
+   #    rowLower[i] <= sum of A[i][j] * x[j] <= rowUpper[i] for every row i,
+   #    lower[j] <= x[j] <= upper[j] for every variable j,
+   #    x[j] integral wherever integer[j] is true.
+   # A is stored sparsely as parallel lists of (rows, cols, vals) entries. Row
+   # bounds may be None for rows unbounded on that side.
+   def __init__(self, numVars, objective, lower, upper, integer):
+      self.numVars = numVars
+      self.objective = objective
+      self.lower = lower
+      self.upper = upper
+      self.integer = integer
+      self.rows = []
+      self.cols = []
+      self.vals = []
+      self.rowLower = []
+      self.rowUpper = []
+
+   # Returns the number of constraint rows.
+   def numRows(self):
+      return len(self.rowLower)
+
+   # Adds 'count' constraint rows with the given lists of lower and upper
+   # bounds (or a single bound for all of them), returning the index of the
+   # first new row.
+   def addRows(self, count, lower, upper):
+      first = self.numRows()
+      if not isinstance(lower, list):
+         lower = [lower] * count
+      if not isinstance(upper, list):
+         upper = [upper] * count
+      self.rowLower += lower
+      self.rowUpper += upper
+      return first
+
+   # Returns the constraint matrix as a list of sparse columns, one per
+   # variable, each a list of (row, value) pairs.
+   def sparseColumns(self):
+      result = [ [] for j in range(self.numVars) ]
+      for row, col, val in zip(self.rows, self.cols, self.vals):
+         result[col].append((row, val))
+      return result
+
+# Returns the pair (model, pairs) for the TA scheduling problem described by a
+# problem.getConfig() configuration. There is one binary variable per (ta, slot)
+# pair with a nonzero preference, and pairs[j] is the (ta, slot) pair of
+# variable j. Constraints require between min_required_total and
+# max_allowed_total TAs per slot, at least min_required_senior seniors per slot,
+# and between min_hours_per_ta and max_hours_per_ta hours per TA. The objective
+# is total preference adherence weighted by senior priority.
+def scheduleModel(params):
+   numSlots = params['num_time_slots']
+   numTas = params['num_tas']
+   prefs = params['ta_preference']
+   pairs = [ (ta, slot) for ta in range(numTas) for slot in range(numSlots)
+             if prefs[ta][slot] != 0 ]
+
+   # Returns the senior priority coefficient a given ta.
+   def senior_priority_coefficent(ta):
+      return params['senior_priority'] * (params['quarters_taught'][ta] - 1) + 1
+
+   coefficients = map(senior_priority_coefficent, range(numTas))
+   objective = [ coefficients[ta] * prefs[ta][slot] for ta, slot in pairs ]
+   model = Model(len(pairs), objective, [0] * len(pairs), [1] * len(pairs),
+                 [True] * len(pairs))
+
+   totalRows = model.addRows(numSlots, list(params['min_required_total']),
+                             list(params['max_allowed_total']))
+   seniorRows = model.addRows(numSlots, list(params['min_required_senior']),
+                              None)
+   taRows = model.addRows(numTas, params['min_hours_per_ta'],
+                          map(params['max_hours_per_ta'], range(numTas)))
+
+   # Each variable appears in its slot's total row, its TA's hours row and, for
+   # seniors, its slot's senior row.
+   isSenior = map(params['is_senior'], range(numTas))
+   for var, (ta, slot) in enumerate(pairs):
+      model.rows += [totalRows + slot, taRows + ta]
+      model.cols += [var, var]
+      model.vals += [1, 1]
+      if isSenior[ta]:
+         model.rows.append(seniorRows + slot)
+         model.cols.append(var)
+         model.vals.append(1)
+   return model, pairs
+
+# Returns the schedule given by a solution 'x' of a scheduleModel with given
+# 'pairs' as a list with one list of scheduled TAs per slot.
+def scheduleFromSolution(x, pairs, numSlots):
+   schedule = [ [] for slot in range(numSlots) ]
+   for var, (ta, slot) in enumerate(pairs):
+      if x[var] > 0.5:
+         schedule[slot].append(ta)
+   return schedule
+
+class Solver:
+   # Returns the pair (objective value, x) of an optimal solution to the given
+   # Model. Raises ValueError if the model is infeasible.
+   def solve(self, model):
+      raise NotImplementedError()
+
+class ScipySolver(Solver):
+   # Solves models with scipy.optimize.milp (HiGHS), passing the constraint
+   # matrix in sparse form. Requires scipy 1.9 or later.
+   def solve(self, model):
+      if scipyMilp == None:
+         raise ValueError('scipy.optimize.milp is not available')
+      inf = float('inf')
+      matrix = coo_matrix((model.vals, (model.rows, model.cols)),
+                          shape=(model.numRows(), model.numVars))
+      lower = [ -inf if b == None else b for b in model.rowLower ]
+      upper = [ inf if b == None else b for b in model.rowUpper ]
+      result = scipyMilp([ -c for c in model.objective ],
+                         constraints=LinearConstraint(matrix, lower, upper),
+                         integrality=map(int, model.integer),
+                         bounds=Bounds(model.lower, model.upper))
+      if result.x is None:
+         raise ValueError('Model is infeasible: ' + result.message)
+      return -result.fun, list(result.x)
+
+class BranchAndBoundSolver(Solver):
+   # Solves models by depth-first branch and bound on the most fractional
+   # integer variable, bounding with linear relaxations solved by a bundled
+   # bounded-variable simplex method. Gives up after 'maxNodes' relaxations,
+   # returning the best integral solution found so far.
+   def __init__(self, maxNodes=10000):
+      self.maxNodes = maxNodes
+
+   def solve(self, model):
+      columns = model.sparseColumns()
+      best = None
+      nodes = [(list(model.lower), list(model.upper))]
+      explored = 0
+      while len(nodes) > 0 and explored < self.maxNodes:
+         lower, upper = nodes.pop()
+         explored += 1
+         relaxation = simplex(columns, model.rowLower, model.rowUpper,
+                              model.objective, lower, upper)
+         if relaxation == None:
+            continue
+         value, x = relaxation
+         if best != None and value <= best[0] + EPSILON:
+            continue
+         branch = None
+         fraction = EPSILON
+         for j in range(model.numVars):
+            if model.integer[j]:
+               distance = abs(x[j] - round(x[j]))
+               if distance > fraction:
+                  branch = j
+                  fraction = distance
+         if branch == None:
+            best = (value, [ round(v) if model.integer[j] else v
+                             for j, v in enumerate(x) ])
+            continue
+         # Explore the branch rounding to the nearest integer first.
+         floor = int(math.floor(x[branch]))
+         down = (lower, upper[:branch] + [floor] + upper[branch + 1:])
+         up = (lower[:branch] + [floor + 1] + lower[branch + 1:], upper)
+         if x[branch] - floor >= 0.5:
+            nodes += [down, up]
+         else:
+            nodes += [up, down]
+      if best == None:
+         raise ValueError('Model is infeasible')
+      return best
+
+# Returns the default solver: ScipySolver if scipy.optimize.milp is installed,
+# and BranchAndBoundSolver otherwise.
+def defaultSolver():
+   if scipyMilp != None:
+      return ScipySolver()
+   return BranchAndBoundSolver()
+
+# Returns the pair (objective value, x) maximizing the sum of objective[j] *
+# x[j] subject to rowLower[i] <= (A x)[i] <= rowUpper[i] and lower[j] <= x[j]
+# <= upper[j], where 'columns' holds the columns of A as lists of (row, value)
+# pairs, variable bounds are finite and every row has at least one bound.
+# Returns None if the problem is infeasible.
+#
+# Each row gets a variable r[i] = (A x)[i] bounded by the row bounds, so that
+# constraints are equalities with zero right hand sides, and an artificial
+# variable a[i] >= 0 absorbing the initial infeasibility. Phase 1 drives the
+# artificials to 0, after which they are fixed at 0 for phase 2. This is the
+# revised simplex method with a dense basis inverse, and nonbasic variables
+# sit at one of their bounds.
+def simplex(columns, rowLower, rowUpper, objective, lower, upper):
+   numRows = len(rowLower)
+   numVars = len(objective)
+   inf = float('inf')
+   lower = list(lower) + [ -inf if b == None else b for b in rowLower ] \
+                       + [0.0] * numRows
+   upper = list(upper) + [ inf if b == None else b for b in rowUpper ] \
+                       + [inf] * numRows
+   numAll = numVars + 2 * numRows
+   if any([ lower[j] > upper[j] for j in range(numAll) ]):
+      return None
+
+   # Start with x at its lower bounds. Rows whose activity is within bounds
+   # start with r basic, and other rows start with r at a bound and the
+   # artificial basic.
+   value = list(lower)
+   atUpper = [False] * numAll
+   activity = [0.0] * numRows
+   for j in range(numVars):
+      if value[j] != 0:
+         for row, a in columns[j]:
+            activity[row] += a * value[j]
+   columns = list(columns) + [ [(i, -1.0)] for i in range(numRows) ]
+   basis = []
+   inverse = [ [0.0] * numRows for i in range(numRows) ]
+   for i in range(numRows):
+      r = numVars + i
+      a = numVars + numRows + i
+      if lower[r] <= activity[i] <= upper[r]:
+         basis.append(r)
+         value[r] = activity[i]
+         inverse[i][i] = -1.0
+         columns.append([(i, 1.0)])
+         continue
+      value[r] = lower[r] if activity[i] < lower[r] else upper[r]
+      atUpper[r] = activity[i] > upper[r]
+      sign = -1.0 if activity[i] > value[r] else 1.0
+      basis.append(a)
+      value[a] = abs(activity[i] - value[r])
+      inverse[i][i] = sign
+      columns.append([(i, sign)])
+
+   phase1 = [0.0] * (numVars + numRows) + [-1.0] * numRows
+   if not _optimize(columns, inverse, basis, value, atUpper, lower, upper,
+                    phase1, numVars + numRows):
+      return None
+   if sum(value[numVars + numRows:]) > EPSILON * max(1, numRows):
+      return None
+   for a in range(numVars + numRows, numAll):
+      upper[a] = 0.0
+   phase2 = list(objective) + [0.0] * (2 * numRows)
+   _optimize(columns, inverse, basis, value, atUpper, lower, upper, phase2,
+             numVars + numRows)
+   x = value[:numVars]
+   return sum([ c * v for c, v in zip(objective, x) ]), x
+
+# Runs bounded-variable revised simplex iterations maximizing 'costs', letting
+# only the first 'numEntering' variables enter the basis. Updates the basis
+# inverse, basis, values and bound states in place. Returns false if the
+# objective is unbounded.
+def _optimize(columns, inverse, basis, value, atUpper, lower, upper, costs,
+              numEntering):
+   numRows = len(basis)
+   inf = float('inf')
+   isBasic = [False] * len(costs)
+   for b in basis:
+      isBasic[b] = True
+   # Prices y = c_B B^-1, updated after every pivot.
+   prices = [0.0] * numRows
+   for i in range(numRows):
+      c = costs[basis[i]]
+      if c != 0:
+         prices = [ y + c * b for y, b in zip(prices, inverse[i]) ]
+   degenerate = 0
+   start = 0
+   while True:
+      # Reduced costs are c_j - y A_j.
+
+      # Choose the entering variable by partial pricing: the best candidate in
+      # the next block of variables that has one (cycling through them), or
+      # the first candidate after many degenerate pivots (Bland's rule).
+      entering = None
+      best = EPSILON
+      bland = degenerate >= DEGENERATE_PIVOTS
+      order = range(numEntering) if bland else \
+              range(start, numEntering) + range(start)
+      for count, j in enumerate(order):
+         if entering != None and count >= PRICING_BLOCK:
+            start = j
+            break
+         if isBasic[j] or lower[j] == upper[j]:
+            continue
+         reduced = costs[j]
+         for row, a in columns[j]:
+            reduced -= prices[row] * a
+         gain = -reduced if atUpper[j] else reduced
+         if gain > best:
+            entering = j
+            enteringReduced = reduced
+            best = gain
+            if bland:
+               break
+      if entering == None:
+         return True
+      direction = -1.0 if atUpper[entering] else 1.0
+
+      # The entering column in terms of the basis, B^-1 A_j.
+      alphas = [0.0] * numRows
+      for row, a in columns[entering]:
+         for i in range(numRows):
+            alphas[i] += inverse[i][row] * a
+
+      # Ratio test: the entering variable may flip to its other bound, or move
+      # until a basic variable reaches a bound.
+      step = upper[entering] - lower[entering]
+      leaving = None
+      for i in range(numRows):
+         alpha = direction * alphas[i]
+         if alpha > EPSILON:
+            limit = (value[basis[i]] - lower[basis[i]]) / alpha
+         elif alpha < -EPSILON:
+            limit = (upper[basis[i]] - value[basis[i]]) / -alpha
+         else:
+            continue
+         if limit < step - EPSILON or (leaving == None and limit < step):
+            step = limit
+            leaving = i
+      if step == inf:
+         return False
+      degenerate = degenerate + 1 if step <= EPSILON else 0
+
+      for i in range(numRows):
+         value[basis[i]] -= direction * step * alphas[i]
+      value[entering] += direction * step
+      if leaving == None:
+         atUpper[entering] = not atUpper[entering]
+         continue
+
+      # Pivot the entering variable into the basis.
+      old = basis[leaving]
+      atUpper[old] = alphas[leaving] * direction < 0
+      value[old] = upper[old] if atUpper[old] else lower[old]
+      isBasic[old] = False
+      isBasic[entering] = True
+      basis[leaving] = entering
+      atUpper[entering] = False
+      pivotRow = [ b / alphas[leaving] for b in inverse[leaving] ]
+      inverse[leaving] = pivotRow
+      for i in range(numRows):
+         factor = alphas[i]
+         if i != leaving and factor != 0:
+            inverse[i] = [ b - factor * p for b, p in zip(inverse[i], pivotRow) ]
+      prices = [ y + enteringReduced * p for y, p in zip(prices, pivotRow) ]
@@ -1,13 +1,22 @@
-from random import random
+import random
+from itertools import product
 
-# Returns a 'break ties' function for the simulator that chooses to dequeue from
-# the 2 or 10 minute queue if either is above given thresholds. If neither or
-# both is above given thresholds, the 'break ties' function returns a random
-# choice, with odds 'twoMinPref':1 in favor of the 2-min queue.
-def crisisThresholdsAndFlip(twoMinWaitTreshold, tenMinWaitThreshold, twoMinPref):
-   def breakTies(twoMinWait, tenMinWait):
-      twoMinCrisis = twoMinWait > float(twoMinWaitTreshold)
-      tenMinCrisis = tenMinWait > float(tenMinWaitThreshold)
+class CrisisThresholdsAndFlip:
+   # Initializes a policy that chooses to dequeue from the 2 or 10 minute queue
+   # if either is above given thresholds. If neither or both is above given
+   # thresholds, the choice is random, with odds 'twoMinPref':1 in favor of the
+   # 2-min queue.
+   def __init__(self, twoMinWaitTreshold, tenMinWaitThreshold, twoMinPref):
+      self.twoMinWaitTreshold = float(twoMinWaitTreshold)
+      self.tenMinWaitThreshold = float(tenMinWaitThreshold)
+      self.twoMinPref = twoMinPref
+
+   # Returns the queue ('2' or '10') to dequeue from given the head waits of
+   # both queues. 'draw' is a function returning a uniform random number in
+   # [0, 1), called only when a random choice is needed.
+   def choose(self, twoMinWait, tenMinWait, draw):
+      twoMinCrisis = twoMinWait > self.twoMinWaitTreshold
+      tenMinCrisis = tenMinWait > self.tenMinWaitThreshold
       if twoMinCrisis and not tenMinCrisis:
          return '2'
       elif tenMinCrisis and not twoMinCrisis:
@@ -15,8 +24,70 @@ def crisisThresholdsAndFlip(twoMinWaitTreshold, tenMinWaitThreshold, twoMinPref)
 
       # Either both or neither queues is in dire need. Choose randomly
       # according to customizable odds.
-      elif random() < 1.0 / (twoMinPref + 1):
+      elif draw() < 1.0 / (self.twoMinPref + 1):
          return '10'
       else:
          return '2'
-   return breakTies
+
+   # Returns a 'break ties' function for the simulator applying this policy,
+   # with random choices drawn from 'rng' (a random.Random).
+   def breakTies(self, rng):
+      return lambda twoMinWait, tenMinWait : \
+         self.choose(twoMinWait, tenMinWait, rng.random)
+
+# Returns a 'break ties' function for the simulator that chooses to dequeue from
+# the 2 or 10 minute queue if either is above given thresholds. If neither or
+# both is above given thresholds, the 'break ties' function returns a random
+# choice, with odds 'twoMinPref':1 in favor of the 2-min queue. Random choices
+# are drawn from 'rng' (a random.Random), or the global generator if omitted.
+def crisisThresholdsAndFlip(twoMinWaitTreshold, tenMinWaitThreshold, twoMinPref,
+                            rng=random):
+   policy = CrisisThresholdsAndFlip(twoMinWaitTreshold, tenMinWaitThreshold,
+                                    twoMinPref)
+   return policy.breakTies(rng)
+
+# Returns a list of 'count' uniform random numbers in [0, 1) drawn from a
+# generator seeded with 'seed'. Evaluating several policies against the same
+# draws (common random numbers) makes their differences less noisy.
+def uniforms(count, seed=None):
+   rng = random.Random(seed)
+   return [ rng.random() for i in xrange(count) ]
+
+# Returns the list of all (twoMinWaitTreshold, tenMinWaitThreshold, twoMinPref)
+# parameter tuples that can be formed from the given lists of values.
+def parameterGrid(twoMinWaitTresholds, tenMinWaitThresholds, twoMinPrefs):
+   return list(product(twoMinWaitTresholds, tenMinWaitThresholds, twoMinPrefs))
+
+# Returns a map from each parameter tuple in 'grid' (as made by parameterGrid)
+# to the list of choices ('2' or '10') crisisThresholdsAndFlip with those
+# parameters makes for each state i, given by the head waits twoMinWaits[i] and
+# tenMinWaits[i]. The uniform draw 'draws[i]' decides state i if it is a random
+# choice, for every parameter tuple. Each comparison against a threshold or
+# odds value is made once per distinct value in the grid, not once per tuple.
+def evaluateGrid(grid, twoMinWaits, tenMinWaits, draws):
+   if not len(twoMinWaits) == len(tenMinWaits) == len(draws):
+      raise ValueError('states and draws must have the same length')
+
+   # Returns a map from each value in 'values' to a bytearray holding, for each
+   # state, 1 if test(value, state) is true and 0 otherwise.
+   def masks(values, test, states):
+      return dict([ (value, bytearray([ test(value, x) for x in states ]))
+                    for value in set(values) ])
+
+   twoMinCrisis = masks([ p[0] for p in grid ],
+                        lambda t, wait : wait > float(t), twoMinWaits)
+   tenMinCrisis = masks([ p[1] for p in grid ],
+                        lambda t, wait : wait > float(t), tenMinWaits)
+   tenMinFlip = masks([ p[2] for p in grid ],
+                      lambda pref, u : u < 1.0 / (pref + 1), draws)
+   # A state is decided by the flip only if both or neither queues are in
+   # crisis, in which case the two crisis flags are equal.
+   choices = ['2', '10']
+   result = {}
+   for params in grid:
+      two = twoMinCrisis[params[0]]
+      ten = tenMinCrisis[params[1]]
+      flip = tenMinFlip[params[2]]
+      result[params] = [ choices[f] if a == b else choices[b]
+                         for a, b, f in zip(two, ten, flip) ]
+   return result
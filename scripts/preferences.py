@@ -1,5 +1,9 @@
-from random import choice, randint, gammavariate, shuffle
+from random import choice, randint, gammavariate, shuffle, Random
+from math import exp, log, lgamma, sqrt
+from array import array
 from conf import *
+from slots import SLOTS
+import struct
 
 NUM_CLASSES = range(2, 4)
 NUM_SECTIONS = range(1, 2)
@@ -41,7 +45,7 @@ def tierDays(preferences):
 # values are initially one.
 def preferenceMap():
    preferences = {}
-   for day in HOURS:
+   for day in SLOTS.days:
       preferences[day] = [1] * HOURS[day]
    return preferences
 
@@ -88,21 +92,142 @@ def getRandomTAPreferenceMap():
    tierDays(prefs)
    return prefs
 
-# Converts the preference map to a simple list of hours, based on alphabetically
-# ordered day keys.
+# Converts the preference map to a simple list of hours, with days in
+# slots.LEGACY_DAYS order and hours in order within each day (the numbering of
+# SLOTS).
 def serialize(prefMap):
-   result = []
-   for day in prefMap:
-      result += prefMap[day]
-   return result
+   return SLOTS.flatten(prefMap)
 
 # Converts an hour list representation to a day-keyed preference map. Assumes
 # that the given list was generated by serialize().
 def deserialize(prefList):
-   result = preferenceMap()
-   index = 0
-   for day in result:
-      for i in range(len(result[day])):
-         result[day][i] = prefList[index]
-         index += 1
-   return result
+   return SLOTS.unflatten(prefList)
+
+# Binary preference matrix files begin with this magic string, the number of TAs
+# and the number of slots, followed by one row of float32 preferences per TA.
+MATRIX_MAGIC = 'PRF1'
+MATRIX_HEADER = '<4sII'
+
+# Returns the regularized lower incomplete gamma function P(a, x), the CDF at x
+# of a gamma distribution with shape a and scale 1.
+def gammaCDF(a, x):
+   if x <= 0:
+      return 0.0
+   logPrefix = a * log(x) - x - lgamma(a)
+   if x < a + 1:
+      # Series expansion.
+      term = total = 1.0 / a
+      n = a
+      while abs(term) > abs(total) * 1e-12:
+         n += 1
+         term *= x / n
+         total += term
+      return total * exp(logPrefix)
+   # Continued fraction for the upper function Q(a, x), by Lentz's method.
+   tiny = 1e-300
+   b = x + 1 - a
+   c = 1.0 / tiny
+   d = 1.0 / b
+   h = d
+   i = 0
+   while True:
+      i += 1
+      an = -i * (i - a)
+      b += 2
+      d = an * d + b
+      d = tiny if abs(d) < tiny else d
+      c = b + an / c
+      c = tiny if abs(c) < tiny else c
+      d = 1.0 / d
+      delta = d * c
+      h *= delta
+      if abs(delta - 1) < 1e-12:
+         break
+   return 1.0 - exp(logPrefix) * h
+
+# Returns the list of probabilities that a single sample drawn by
+# preferenceVector lands on each index of a vector of given size.
+def peakProbabilities(size, peak):
+   shape = float(peak) / 3
+   cdf = [ gammaCDF(shape, float(k) / 3) for k in range(size + 1) ]
+   return [ cdf[k + 1] - cdf[k] for k in range(size) ]
+
+class PreferenceGenerator:
+   # Initializes a generator of random TA preference rows drawing from a
+   # random.Random seeded with 'seed'. Rows follow the same model as
+   # getRandomTAPreferenceMap and are in serialize() slot order. Instead of
+   # drawing 'samples' gamma variates per day, the count of samples landing on
+   # each hour is drawn at once from its normal approximation, using
+   # probabilities precomputed per (day length, peak).
+   def __init__(self, seed=None, samples=1000):
+      self.random = Random(seed)
+      self.samples = samples
+      self.days = SLOTS.days
+      self.offsets = SLOTS.offsets
+      self.numSlots = len(SLOTS)
+      self.moments = {}
+
+   # Returns the list of (mean, standard deviation) pairs of the count of
+   # samples per hour for a day of given size and peak.
+   def _moments(self, size, peak):
+      if (size, peak) not in self.moments:
+         n = self.samples
+         self.moments[(size, peak)] = [ (n * p, sqrt(n * p * (1 - p)))
+                                        for p in peakProbabilities(size, peak) ]
+      return self.moments[(size, peak)]
+
+   # Returns one random preference row.
+   def row(self):
+      rng = self.random
+      row = [0.0] * self.numSlots
+      ordering = [ float(i) / len(self.days) for i in range(1, len(self.days) + 1) ]
+      rng.shuffle(ordering)
+      for day in self.days:
+         size = HOURS[day]
+         overlay = [ 1 + max(0, int(round(rng.gauss(mean, std))))
+                     for mean, std in self._moments(size, rng.randint(1, size - 1)) ]
+         scale = ordering.pop() / max(overlay)
+         offset = self.offsets[day]
+         for i in range(size):
+            row[offset + i] = overlay[i] * scale
+
+      # Black out some MWF lectures and TTh sections.
+      for days, counts in [(['Monday', 'Wednesday', 'Friday'], NUM_CLASSES),
+                           (['Tuesday', 'Thursday'], NUM_SECTIONS)]:
+         for hour in rng.sample(range(8), rng.choice(counts)):
+            for day in days:
+               if hour < HOURS[day]:
+                  row[self.offsets[day] + hour] = 0
+      return row
+
+   # Yields 'numTas' random preference rows.
+   def rows(self, numTas):
+      for i in xrange(numTas):
+         yield self.row()
+
+# Writes the preference rows (an iterable of equal length rows) for 'numTas'
+# TAs with 'numSlots' slots each to the named binary file, one row at a time.
+def writePreferenceMatrix(filename, rows, numTas, numSlots):
+   file = open(filename, 'wb')
+   try:
+      file.write(struct.pack(MATRIX_HEADER, MATRIX_MAGIC, numTas, numSlots))
+      for row in rows:
+         array('f', row).tofile(file)
+   finally:
+      file.close()
+
+# Returns the preference matrix (a list of rows) in the named binary file
+# written by writePreferenceMatrix.
+def readPreferenceMatrix(filename):
+   file = open(filename, 'rb')
+   try:
+      header = file.read(struct.calcsize(MATRIX_HEADER))
+      magic, numTas, numSlots = struct.unpack(MATRIX_HEADER, header)
+      if magic != MATRIX_MAGIC:
+         raise ValueError('Not a preference matrix file: ' + filename)
+      values = array('f')
+      values.fromfile(file, numTas * numSlots)
+   finally:
+      file.close()
+   return [ values[i * numSlots:(i + 1) * numSlots].tolist()
+            for i in range(numTas) ]
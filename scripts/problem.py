@@ -1,44 +1,171 @@
-import json, preferences
+import json, os, preferences
+from slots import SLOTS
+try:
+   import cPickle as pickle
+except ImportError:
+   import pickle
 
-# A JSON object with a single key "prefs" mapping to a 2D array of floats. Each
-# row corresponds to a TA and each column to a time slot.
-prefs = json.load(open('prefs.txt'))
+# Configuration data files, all JSON objects, keyed on the name used below.
+# "prefs" maps to a 2D array of floats. Each row corresponds to a TA and each
+# column to a time slot, numbered as in slots.SLOTS.
+# "quotas" has two keys "total" and "senior" each mapping to a quota dict. Each
+# quota dict is keyed on the day of the week and keyed on a list of all minimum
+# workers required for each hour that day.
+# "seniority" maps to a list of seniority numbers (number of quarters that TA
+# has taught).
+# "max_hours" maps to a list of max hours numbers (the most any TA would like to
+# work).
+FILES = {
+   'prefs': 'prefs.txt',
+   'quotas': 'quotas.txt',
+   'seniority': 'seniority.txt',
+   'max_hours': 'max_hours.txt'
+}
 
-# A JSON object with two keys "total" and "senior" each mapping to a quota dict.
-# Each quota dict is keyed on the day of the week and keyed on a list of all
-# minimum workers required for each hour that day.
-quotas = json.load(open('quotas.txt'))
+# Binary preference matrix (written by generate_prefs.py) read instead of the
+# "prefs" file if it exists.
+PREFS_MATRIX = 'prefs.bin'
 
-# A JSON object of a single key "seniority" mapping to a list of seniority
-# numbers (number of quarters that TA has taught).
-seniority = json.load(open('seniority.txt'))
+# Values computed from configuration files are pickled next to each file with
+# this suffix, together with the file's mtime and size, so later runs can skip
+# parsing while the file is unchanged.
+CACHE_SUFFIX = '.cache'
 
-# A JSON object of a single key "max_hours" mapping to a list of max hours
-# numbers (the most any TA would like to work).
-max_hours_per_ta = json.load(open('max_hours.txt'))
+# Bumped whenever the values computed from configuration files change, so that
+# sidecars written by older code are ignored.
+CACHE_VERSION = 3
+
+# In-process cache of computed values, keyed on (path, stamp, name).
+_values = {}
+
+# Returns a deeply immutable copy of a parsed JSON value, with lists converted
+# to tuples.
+def freeze(value):
+   if isinstance(value, list):
+      return tuple(map(freeze, value))
+   if isinstance(value, dict):
+      return dict([ (key, freeze(value[key])) for key in value ])
+   return value
+
+# Returns the configuration data in the binary preference matrix file at
+# 'path', in the shape of the "prefs" JSON file.
+def loadPreferenceMatrix(path):
+   rows = preferences.readPreferenceMatrix(path)
+   if len(rows) > 0 and len(rows[0]) != len(SLOTS):
+      raise ValueError('expected {0} slots in {1}'.format(len(SLOTS), path))
+   return { 'prefs': rows }
+
+# Returns the JSON data in the file at 'path'.
+def loadJSON(path):
+   return json.load(open(path))
+
+# Returns the value named 'name' computed by compute(data) from the data parsed
+# by load(path) (JSON by default) from the file at 'path'. Values are cached in
+# process and in the file's pickle sidecar, and recomputed only when the file's
+# mtime or size changes.
+def cachedValue(path, name, compute, load=loadJSON):
+   stat = os.stat(path)
+   stamp = (CACHE_VERSION, stat.st_mtime, stat.st_size)
+   key = (os.path.abspath(path), stamp, name)
+   if key in _values:
+      return _values[key]
+
+   cachePath = path + CACHE_SUFFIX
+   cache = {}
+   try:
+      cacheStamp, cache = pickle.load(open(cachePath, 'rb'))
+      if cacheStamp != stamp:
+         cache = {}
+   except (IOError, OSError, EOFError, ValueError, pickle.UnpicklingError):
+      cache = {}
+   if name not in cache:
+      data = cache.get(None)
+      if data == None:
+         data = cache[None] = freeze(load(path))
+      cache[name] = compute(data)
+      try:
+         pickle.dump((stamp, cache), open(cachePath, 'wb'), pickle.HIGHEST_PROTOCOL)
+      except (IOError, OSError):
+         pass
+   _values[key] = cache[name]
+   return _values[key]
+
+class Config:
+   # Initializes a program configuration reading configuration data files from
+   # 'directory'. Nothing is read until a value is first accessed, and each
+   # value is then computed at most once.
+   def __init__(self, directory):
+      self.directory = directory
+      self.values = {
+         'min_hours_per_ta': 2,
+         'max_hours_per_ta': lambda ta : min(self['max_hours'][ta], 19.5),
+         'is_senior': lambda ta : self['quarters_taught'][ta] >= 3,
+         'senior_priority': 1,
+         'min_pref': 0.3,
+         'slots': SLOTS
+      }
+
+   def __getitem__(self, key):
+      if key not in self.values:
+         self.values[key] = self._compute(key)
+      return self.values[key]
+
+   def __contains__(self, key):
+      return key in self.keys()
+
+   # Returns the names of all configuration values.
+   def keys(self):
+      return self.values.keys() + [ key for key in self._derived()
+                                    if key not in self.values ]
+
+   # Returns the value named 'key' computed from the file named 'file' by
+   # compute(data), through the file's cache. Preferences are read from the
+   # binary PREFS_MATRIX instead if the directory has one.
+   def _fromFile(self, file, key, compute):
+      if file == 'prefs':
+         path = os.path.join(self.directory, PREFS_MATRIX)
+         if os.path.exists(path):
+            return cachedValue(path, key, compute, loadPreferenceMatrix)
+      path = os.path.join(self.directory, FILES[file])
+      return cachedValue(path, key, compute)
+
+   # Returns a map from each derived value name to a function computing it.
+   def _derived(self):
+      def thresholded(data):
+         # Treat all preferences below min_pref as 0.
+         minPref = self['min_pref']
+         return tuple([ tuple([ x if x >= minPref else 0 for x in row ])
+                        for row in data['prefs'] ])
+      return {
+         'ta_preference': lambda : self._fromFile('prefs',
+            ('ta_preference', self['min_pref']), thresholded),
+         'min_required_total': lambda : self._fromFile('quotas',
+            'min_required_total',
+            lambda data : tuple(preferences.serialize(data['total']))),
+         'min_required_senior': lambda : self._fromFile('quotas',
+            'min_required_senior',
+            lambda data : tuple(preferences.serialize(data['senior']))),
+         'quarters_taught': lambda : self._fromFile('seniority',
+            'quarters_taught', lambda data : data['seniority']),
+         'max_hours': lambda : self._fromFile('max_hours', 'max_hours',
+            lambda data : data['max_hours']),
+         # Allow 2 more than the minimum in each time slot.
+         'max_allowed_total': lambda : tuple(map(lambda x : x + 2,
+            self['min_required_total'])),
+         'num_tas': lambda : len(self['ta_preference']),
+         'num_time_slots': lambda : len(self['min_required_total'])
+      }
+
+   # Computes the derived value named 'key'.
+   def _compute(self, key):
+      derived = self._derived()
+      if key not in derived:
+         raise KeyError(key)
+      return derived[key]()
 
 # Returns a program configuration containing all constant values and predicates
-# for a given scheduling problem. Some are loaded from configuration data files,
-# while other constants are included as literals below.
-def getConfig():
-   config = {
-      'min_hours_per_ta': 2,
-      'max_hours_per_ta': lambda ta : min(max_hours_per_ta['max_hours'][ta], 19.5),
-      'min_required_total': preferences.serialize(quotas["total"]),
-      'min_required_senior': preferences.serialize(quotas["senior"]),
-      'ta_preference': prefs['prefs'],
-      'quarters_taught': seniority['seniority'],
-      'is_senior': lambda ta : config['quarters_taught'][ta] >= 3,
-      'senior_priority': 1,
-      'min_pref': 0.3
-   }
-
-   # Allow 2 more than the minimum in each time slot.
-   config['max_allowed_total'] = map(lambda x : x + 2, config['min_required_total'])
-   config['num_tas'] = len(config['ta_preference'])
-   config['num_time_slots'] = len(config['min_required_total'])
-
-   # Treat all preferences below min_pref.
-   meetMinPref = lambda row : map(lambda x : x if x >= config['min_pref'] else 0, row)
-   config['ta_preference'] = map(lambda row : meetMinPref(row), config['ta_preference'])
-   return config
+# for a given scheduling problem. Some are loaded lazily from configuration
+# data files in 'directory' (the current directory by default), while other
+# constants are included as literals above. Values are immutable.
+def getConfig(directory='.'):
+   return Config(directory)
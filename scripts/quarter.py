@@ -0,0 +1,136 @@
+from sys import argv, exit
+from multiprocessing import Pool, cpu_count
+from data import QueueData, dayName
+from conf import DAY_NAMES, QUEUE_TYPES
+from simulation import Simulator, delayStatistics
+from policies import crisisThresholdsAndFlip
+from problem import getConfig
+
+class WeeklyStaffing:
+   # Initializes a staffing function for Simulator.runDays giving each day the
+   # hourly regular and senior TA requirements of its day of the week in the
+   # problem configuration 'config'. Days are named as by QueueData.byWeek,
+   # relative to the date 'origin' returned by QueueData.origin.
+   def __init__(self, config, origin):
+      self.origin = origin
+      slots = config['slots']
+      self.byDay = {}
+      for day in DAY_NAMES:
+         senior = list(slots.view(config['min_required_senior'], day))
+         total = slots.view(config['min_required_total'], day)
+         self.byDay[day] = ([ t - s for t, s in zip(total, senior) ], senior)
+
+   # Returns the pair (regularReqts, seniorReqts) for the given date.
+   def __call__(self, date):
+      return self.byDay[dayName(date, self.origin)]
+
+# Returns the days with requests in weeks 'firstWeek' through 'lastWeek'
+# (inclusive) of the buckets 'byWeek' made by QueueData.byWeek, as a list of
+# pairs of the day's name and its list of requests.
+def namedDays(byWeek, firstWeek, lastWeek):
+   result = []
+   for week in byWeek[firstWeek:lastWeek + 1]:
+      if week != None:
+         result += [ (day, week[day]) for day in DAY_NAMES
+                     if len(week[day]) > 0 ]
+   return result
+
+# Returns the requests of all days in weeks 'firstWeek' through 'lastWeek'
+# (inclusive) of the buckets 'byWeek' made by QueueData.byWeek, as one list per
+# day with requests.
+def requestsByDay(byWeek, firstWeek, lastWeek):
+   return [ requests for day, requests
+            in namedDays(byWeek, firstWeek, lastWeek) ]
+
+# Simulates all given days (lists of requests) as one continuous stream and
+# returns a map from each queue type to the list of its delays. Service times
+# come from 'serviceModel' (a service.ServiceTimeModel) if given.
+def simulateContinuous(days, staffing, policyParams, seed=None,
+                       serviceModel=None):
+   sim = Simulator([ req for day in days for req in day ], seed, serviceModel)
+   policy = crisisThresholdsAndFlip(*policyParams, rng=sim.random)
+   return sim.runDays(lambda report : None, policy, staffing).delaysByType()
+
+# Shard configuration of a worker process, set once per process by _initWorker.
+_config = None
+
+# Stores the shard configuration in a worker process.
+def _initWorker(staffing, policyParams, seed, serviceModel):
+   global _config
+   _config = (staffing, policyParams, seed, serviceModel)
+
+# Simulates one day on its own and returns its map from each queue type to the
+# list of its delays. Each day is seeded with 'seed' and its date, so results
+# do not depend on how days are spread over processes.
+def _runShard(requests):
+   staffing, policyParams, seed, serviceModel = _config
+   if seed != None:
+      seed = seed * 1000000 + requests[0].time_in.date().toordinal()
+   return simulateContinuous([requests], staffing, policyParams, seed,
+                             serviceModel)
+
+# Simulates each of the given days independently, spread over 'processes'
+# worker processes (all cores if None), and returns a map from each queue type
+# to the list of its delays over all days.
+def simulateShards(days, staffing, policyParams, seed=None, processes=None,
+                   serviceModel=None):
+   config = (staffing, policyParams, seed, serviceModel)
+   if processes == None:
+      processes = cpu_count()
+   if processes == 1:
+      _initWorker(*config)
+      results = map(_runShard, days)
+   else:
+      pool = Pool(processes, _initWorker, config)
+      try:
+         results = pool.map(_runShard, days)
+      finally:
+         pool.terminate()
+   delays = dict([ (type, []) for type in QUEUE_TYPES ])
+   for result in results:
+      for type in result:
+         delays[type] += result[type]
+   return delays
+
+# Report correct usage and exit gracefully.
+def usageError():
+   exit('Usage: <request_file_tsv> <first_week> <last_week> ' +
+        '[continuous|shards] [seed] [processes]')
+
+if __name__ == '__main__':
+   try:
+      filename = argv[1]
+      firstWeek = int(argv[2])
+      lastWeek = int(argv[3])
+      mode = argv[4] if len(argv) > 4 else 'continuous'
+      seed = int(argv[5]) if len(argv) > 5 else 1
+      processes = int(argv[6]) if len(argv) > 6 else None
+      if mode not in ['continuous', 'shards']:
+         usageError()
+   except:
+      usageError()
+
+   # Simulate the chosen weeks with data/quotas.txt staffing every day.
+   config = getConfig('data')
+   data = QueueData(filename)
+   days = requestsByDay(data.byWeek(), firstWeek, lastWeek)
+   if len(days) == 0:
+      exit('No requests in weeks {0} to {1}.'.format(firstWeek, lastWeek))
+   print 'Simulating {0} days in weeks {1} to {2} ({3}).'.format(len(days),
+      firstWeek, lastWeek, mode)
+   staffing = WeeklyStaffing(config, data.origin())
+   tieBreakingParams = (10 * 60, 40 * 60, 1.5)
+   if mode == 'continuous':
+      delays = simulateContinuous(days, staffing, tieBreakingParams, seed)
+   else:
+      delays = simulateShards(days, staffing, tieBreakingParams, seed, processes)
+
+   # Print the delay distribution (in minutes) of each queue type.
+   keys = ['mean', 'p50', 'p90', 'p99', 'max']
+   print '\t'.join(['queue_type', 'count'] + keys)
+   for type in QUEUE_TYPES:
+      stats = delayStatistics(delays[type])
+      row = [type, str(stats['count'])]
+      for key in keys:
+         row.append('-' if stats[key] == None else '{0:.3f}'.format(stats[key] / 60.0))
+      print '\t'.join(row)
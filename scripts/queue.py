@@ -1,33 +1,67 @@
-# Returns a list of pairs (delta, event time), where delta is either 1 or -1 to
-# indicate a request entering or exiting the queue at that event time.
-def changes(requests):
-   ins = map(lambda req : (1, req.time_in), requests)
-   outs = map(lambda req : (-1, req.time_out), requests)
-   return sorted(ins + outs, key=lambda pair : pair[1])
+from heapq import merge
+from datetime import datetime
 
-# Returns a list of pairs (duration, count) where duration is the time in
-# between events in provided list of 'changes', and count is the number of
-# requests in the queue during that interval.
-def intervals(changes):
-   intervals = []
+# Returns the pair of lists (ins, outs) of the time_in and time_out of each of
+# 'requests' in seconds since midnight of the first request's day.
+def eventSeconds(requests):
+   origin = datetime.combine(requests[0].time_in.date(), datetime.min.time())
+   def seconds(time):
+      delta = time - origin
+      return delta.days * 86400 + delta.seconds
+   ins = [ seconds(req.time_in) for req in requests ]
+   outs = [ seconds(req.time_out) for req in requests ]
+   return ins, outs
+
+# Returns a list of pairs (event time, count) giving the number of requests in
+# the queue just after each event, with event times as returned by
+# eventSeconds. 'ins' and 'outs' must each be sorted.
+def queueLengthSeries(ins, outs):
+   series = []
    count = 0
-   for i in range(len(changes) - 1):
-      count += changes[i][0]
-      intervals.append(((changes[i + 1][1] - changes[i][1]).seconds, count))
-   return intervals
+   for time, delta in merge([ (t, 1) for t in ins ], [ (t, -1) for t in outs ]):
+      count += delta
+      series.append((time, count))
+   return series
+
+# Returns a statistics dict for one day's 'requests', supposing that each was
+# enqueued at its time_in and dequeued at its time_out, or None if there are no
+# requests. Keys are 'mean_waiting' (the time-weighted mean queue length),
+# 'arrival_rate' (requests per second between the first and last request),
+# 'service_time' (mean_waiting / arrival_rate, by Little's law) and, if
+# 'series' is true, 'series' (the queue length after each event, as returned by
+# queueLengthSeries). Each entry is None where it is undefined.
+def dayStatistics(requests, series=False):
+   if len(requests) == 0:
+      return None
+   ins, outs = eventSeconds(requests)
+   # The queue length integrated over time is the total time spent in queue.
+   start = min(min(ins), min(outs))
+   end = max(max(ins), max(outs))
+   stats = { 'mean_waiting': None, 'arrival_rate': None, 'service_time': None }
+   if end > start:
+      stats['mean_waiting'] = float(sum(outs) - sum(ins)) / (end - start)
+   span = ins[-1] - ins[0]
+   if span > 0:
+      stats['arrival_rate'] = float(len(requests)) / span
+   if stats['mean_waiting'] != None and stats['arrival_rate'] != None:
+      stats['service_time'] = stats['mean_waiting'] / stats['arrival_rate']
+   if series:
+      stats['series'] = queueLengthSeries(sorted(ins), sorted(outs))
+   return stats
+
+# Returns a list of statistics dicts as returned by dayStatistics, one per list
+# of requests in 'days'.
+def batchStatistics(days, series=False):
+   return [ dayStatistics(requests, series) for requests in days ]
 
 # Returns the mean number of waiting given 'requests', supposing that each was
 # enqueued at it's time_in and dequeued at time_out.
 def meanNumberOfWaitingRequests(requests):
    if len(requests) == 0:
       return None
-   counts = intervals(changes(requests))
-   weightedCountSum = sum([ duration * count for (duration, count) in counts ])
-   totalDuration = sum([ duration for (duration, count) in counts ])
-   return float(weightedCountSum) / totalDuration
+   return dayStatistics(requests)['mean_waiting']
 
 # Returns the average arrival rate across all requests.
 def arrivalRate(requests):
-   first = requests[0]
-   last = requests[len(requests) - 1]
-   return float(len(requests)) / (last.time_in - first.time_in).seconds
+   ins, outs = eventSeconds([ requests[0], requests[len(requests) - 1] ])
+   return float(len(requests)) / (ins[1] - ins[0])
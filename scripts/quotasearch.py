@@ -0,0 +1,173 @@
+from sys import argv, exit
+from multiprocessing import Pool, cpu_count
+from data import QueueData
+from conf import DAY_NAMES
+from simulation import Simulator, delayStatistics
+from policies import crisisThresholdsAndFlip
+from problem import getConfig
+from quarter import namedDays
+import json
+
+# Regular TAs added to every hour of the given quotas for the initial upper
+# bound of the search, and the most regular TAs ever tried in one hour.
+HEADROOM = 2
+MAX_REGULAR = 32
+
+# Simulator hour 0 starts at this hour of the day.
+OPENING_HOUR = 12
+
+# Search configuration of a worker process, set once per process by
+# _initWorker.
+_config = None
+
+# Stores the search configuration in a worker process.
+def _initWorker(days, policyParams):
+   global _config
+   _config = (days, policyParams)
+
+# Simulates one day with the given requirements and seed. Returns the list of
+# delay lists of the requests made in each hour of the day, with requests made
+# before the first or after the last hour counted in that hour. Requests that
+# were never served count as infinitely delayed.
+def _runDay(task):
+   index, regular, senior, seed = task
+   days, policyParams = _config
+   sim = Simulator(days[index], seed=seed)
+   policy = crisisThresholdsAndFlip(*policyParams, rng=sim.random)
+   report = sim.run(lambda report : None, policy, regular, senior)
+   delays = report.delays(float('inf'))
+   byHour = [ [] for hour in regular ]
+   for req, delay in zip(sim.buffer, delays):
+      hour = min(len(regular) - 1, max(0, req.time_in.hour - OPENING_HOUR))
+      byHour[hour].append(delay)
+   return byHour
+
+class QuotaSearch:
+   # Initializes a search over staffing of the given 'days' (lists of requests,
+   # all on the same day of the week), evaluating each candidate by simulating
+   # every day once per seed in 'seeds' with the tie-breaking policy
+   # 'policyParams'. Simulations are spread over 'processes' worker processes
+   # (all cores if None).
+   def __init__(self, days, seeds, policyParams, processes=None):
+      self.days = days
+      self.seeds = list(seeds)
+      self.policyParams = policyParams
+      self.processes = processes if processes != None else cpu_count()
+      self.pool = None
+      self.memo = {}
+
+   # Returns the list of p90 delays (in seconds) of the requests made in each
+   # hour, over all days and seeds, with the given regular and senior
+   # requirements. The p90 delay of an hour with a request that was never
+   # served is infinite. Results are memoized on the requirement vectors.
+   def p90s(self, regular, senior):
+      key = (tuple(regular), tuple(senior))
+      if key not in self.memo:
+         tasks = [ (index, list(regular), list(senior), seed)
+                   for index in range(len(self.days)) for seed in self.seeds ]
+         if self.processes == 1:
+            _initWorker(self.days, self.policyParams)
+            results = map(_runDay, tasks)
+         else:
+            if self.pool == None:
+               self.pool = Pool(self.processes, _initWorker,
+                                (self.days, self.policyParams))
+            results = self.pool.map(_runDay, tasks)
+         byHour = [ [] for hour in regular ]
+         for result in results:
+            for hour in range(len(regular)):
+               byHour[hour] += result[hour]
+         stats = map(delayStatistics, byHour)
+         self.memo[key] = [ s['p90'] if s['max'] != float('inf') else s['max']
+                            for s in stats ]
+      return self.memo[key]
+
+   # Returns true if the p90 delay of every hour up to and including 'last' is
+   # at most 'target' seconds with the given requirements, so never if a
+   # request made in one of those hours is not served.
+   def feasible(self, regular, senior, target, last=None):
+      p90s = self.p90s(regular, senior)
+      if last == None:
+         last = len(p90s) - 1
+      return all(p == None or p <= target for p in p90s[:last + 1])
+
+   # Returns the fewest regular TAs for each hour keeping the p90 delay of
+   # every hour at most 'target' seconds, with the given senior requirements.
+   # 'upper' is a list of regular requirements to start from. Hours are fixed
+   # in order by bisection, with later hours at their upper bound, so each
+   # hour's count accounts for the backlog left by the hours before it. An
+   # hour that misses the target even at its upper bound, because of that
+   # backlog, keeps the upper bound. Returns None if even MAX_REGULAR regular
+   # TAs in every hour are not enough.
+   def search(self, senior, target, upper):
+      upper = list(upper)
+      while not self.feasible(upper, senior, target):
+         if min(upper) >= MAX_REGULAR:
+            return None
+         upper = [ min(MAX_REGULAR, 2 * x + 1) for x in upper ]
+      regular = list(upper)
+      for hour in range(len(regular)):
+         low, high = -1, regular[hour]
+         while high - low > 1:
+            middle = (low + high) / 2
+            regular[hour] = middle
+            if self.feasible(regular, senior, target, hour):
+               high = middle
+            else:
+               low = middle
+         regular[hour] = high
+      return regular
+
+   # Stops the worker processes.
+   def close(self):
+      if self.pool != None:
+         self.pool.terminate()
+         self.pool = None
+
+# Report correct usage and exit gracefully.
+def usageError():
+   exit('Usage: <request_file_tsv> <first_week> <last_week> <p90_minutes> ' +
+        '[seeds] [processes] [output_file]')
+
+if __name__ == '__main__':
+   try:
+      filename = argv[1]
+      firstWeek = int(argv[2])
+      lastWeek = int(argv[3])
+      target = float(argv[4]) * 60
+      seeds = int(argv[5]) if len(argv) > 5 else 3
+      processes = int(argv[6]) if len(argv) > 6 else None
+      output = argv[7] if len(argv) > 7 else 'quotas.txt'
+   except:
+      usageError()
+
+   # Search each day of the week over all of its days in the chosen weeks,
+   # keeping the senior quotas of data/quotas.txt, and starting from its
+   # regular quotas plus some headroom. Days without requests keep their
+   # quotas.
+   config = getConfig('data')
+   slots = config['slots']
+   quotas = { 'total': slots.unflatten(config['min_required_total']),
+              'senior': slots.unflatten(config['min_required_senior']) }
+   allDays = namedDays(QueueData(filename).byWeek(), firstWeek, lastWeek)
+   tieBreakingParams = (10 * 60, 40 * 60, 1.5)
+   for day in DAY_NAMES:
+      days = [ requests for name, requests in allDays if name == day ]
+      if len(days) == 0:
+         continue
+      senior = quotas['senior'][day]
+      upper = [ t - s + HEADROOM for t, s in zip(quotas['total'][day], senior) ]
+      search = QuotaSearch(days, range(1, seeds + 1), tieBreakingParams,
+                           processes)
+      try:
+         regular = search.search(senior, target, upper)
+      finally:
+         search.close()
+      if regular == None:
+         print '{0}: no staffing up to {1} regular TAs meets the target'.format(
+            day, MAX_REGULAR)
+         continue
+      quotas['total'][day] = [ r + s for r, s in zip(regular, senior) ]
+      print '{0}: {1} ({2} staffings simulated)'.format(day,
+         quotas['total'][day], len(search.memo))
+   json.dump(quotas, open(output, 'w'))
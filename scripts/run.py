@@ -1,20 +1,24 @@
 from sys import argv, exit
-from simulation import Simulator
 from data import QueueData
 from conf import DAY_NAMES
-from policies import crisisThresholdsAndFlip
-import json
+from trials import runTrials
+from service import ServiceTimeModel
+from problem import getConfig
 
 # Report correct usage and exit gracefully.
 def usageError():
-   exit('Usage: <request_file_tsv> <week> <day>')
+   exit('Usage: <request_file_tsv> <week> <day> [trials] [processes] ' +
+        '[uniform|empirical]')
 
 # Parse command line arguments.
 try:
    filename = argv[1]
    week = int(argv[2])
    day = argv[3]
-   if not day in DAY_NAMES:
+   trials = int(argv[4]) if len(argv) > 4 else 1
+   processes = int(argv[5]) if len(argv) > 5 else None
+   serviceTimes = argv[6] if len(argv) > 6 else 'uniform'
+   if not day in DAY_NAMES or not serviceTimes in ['uniform', 'empirical']:
       usageError()
 except:
    usageError()
@@ -26,24 +30,29 @@ def diff(l1, l2):
 print 'Simulating on {0} of week {1}.'.format(day, week)
 
 # Set up simulation
-quotas = json.load(open('data/quotas.txt'))
-senior = quotas['senior'][day]
-regular = diff(quotas['total'][day], senior)
-requests = QueueData(filename).byWeek()[week][day]
-
-# Run the simulation with above configuration 'trial' number of times.
-def runSim(trials):
-   sim = Simulator(requests)
-   outFile = open("data/results/{0}_{1}_{2}_delays.results".format(week, day, trials), 'w')
-
-   # Report the results to the open file.
-   def reportResults(report):
-      report.printTSV(outFile)
-      if trials > 1:
-         runSim(trials - 1)
-
-   # Run the simulation.
-   tieBreakingPolicy = crisisThresholdsAndFlip(10 * 60, 40 * 60, 1.5)
-   sim.run(reportResults, tieBreakingPolicy, regular, senior)
-
-runSim(1)
+config = getConfig('data')
+senior = config['slots'].view(config['min_required_senior'], day)
+regular = diff(config['slots'].view(config['min_required_total'], day), senior)
+data = QueueData(filename)
+requests = data.byWeek()[week][day]
+# Service times are fitted to the whole file's historical durations if asked.
+serviceModel = ServiceTimeModel(data) if serviceTimes == 'empirical' else None
+tieBreakingParams = (10 * 60, 40 * 60, 1.5)
+
+# Print the running mean delay across trials (in minutes) after each trial.
+def reportTrial(seed, delays, summary):
+   stats = summary.trialMeans
+   low, high = stats.confidenceInterval()
+   params = (seed, stats.count, stats.mean / 60, stats.variance() / 3600)
+   line = 'trial {0} done ({1} total): mean delay {2:.3f} min, variance {3:.3f}'
+   if stats.count > 1:
+      line += ', 95% CI [{4:.3f}, {5:.3f}]'
+      params += (low / 60, high / 60)
+   print line.format(*params)
+
+# Run the simulation with above configuration 'trials' number of times. Each
+# trial is seeded with its trial number, so reruns give the same results.
+summary = runTrials(requests, regular, senior, tieBreakingParams,
+                    range(1, trials + 1), processes, reportTrial, serviceModel)
+delays = summary.byRequest.means()
+print map(lambda i : (i + 1, delays[i] / 60), range(len(delays)))
@@ -0,0 +1,119 @@
+import heapq
+
+class ScheduleState:
+   # Initializes an empty schedule of 'numTas' TAs over 'numSlots' slots,
+   # indexed both ways: the set of slots of each TA and the set of TAs of each
+   # slot, so membership and occupancy queries take constant time.
+   def __init__(self, numTas, numSlots):
+      self.byTA = [ set() for ta in range(numTas) ]
+      self.bySlot = [ set() for slot in range(numSlots) ]
+
+   # Schedules ta for slot.
+   def add(self, ta, slot):
+      self.byTA[ta].add(slot)
+      self.bySlot[slot].add(ta)
+
+   # Unschedules ta from slot.
+   def remove(self, ta, slot):
+      self.byTA[ta].discard(slot)
+      self.bySlot[slot].discard(ta)
+
+   # Returns true if ta is scheduled for slot, false otherwise.
+   def has(self, ta, slot):
+      return slot in self.byTA[ta]
+
+   # Returns the number of TAs scheduled for slot.
+   def occupancy(self, slot):
+      return len(self.bySlot[slot])
+
+   # Returns the number of slots ta is scheduled for.
+   def hours(self, ta):
+      return len(self.byTA[ta])
+
+   # Returns the schedule as a list with one sorted list of TAs per slot.
+   def slotLists(self):
+      return [ sorted(tas) for tas in self.bySlot ]
+
+   # Returns the schedule as a list with one sorted list of slots per TA.
+   def taLists(self):
+      return [ sorted(slots) for slots in self.byTA ]
+
+class Counters:
+   # Initializes counters with the given list of values, tracking which are
+   # nonzero so that allZero() and firstNonZero() take (amortized) constant
+   # and logarithmic time.
+   def __init__(self, values):
+      self.values = list(values)
+      self.nonzero = len(filter(lambda val : val != 0, self.values))
+      self.heap = [ i for i in range(len(self.values)) if self.values[i] != 0 ]
+
+   def __getitem__(self, i):
+      return self.values[i]
+
+   # Sets counter i to the given value.
+   def set(self, i, value):
+      if (self.values[i] != 0) != (value != 0):
+         self.nonzero += 1 if value != 0 else -1
+         if value != 0:
+            heapq.heappush(self.heap, i)
+      self.values[i] = value
+
+   # Decrements counter i by one.
+   def decrement(self, i):
+      self.set(i, self.values[i] - 1)
+
+   # Returns true if all counters are 0, false otherwise.
+   def allZero(self):
+      return self.nonzero == 0
+
+   # Returns the index of the first nonzero counter. Raises ValueError if all
+   # counters are zero.
+   def firstNonZero(self):
+      while len(self.heap) > 0 and self.values[self.heap[0]] == 0:
+         heapq.heappop(self.heap)
+      if len(self.heap) == 0:
+         raise ValueError()
+      return self.heap[0]
+
+class PreferenceQueues:
+   # Initializes one priority queue of candidates per key from a matrix of
+   # preferences, where prefs[key][candidate] is the preference of key for
+   # candidate (e.g. keys are TAs and candidates slots, or the transpose). If
+   # given, only candidates in 'candidates' are queued. Among equal
+   # preferences, higher candidate indices come first. Queues are built on
+   # first use.
+   def __init__(self, prefs, candidates=None):
+      self.prefs = prefs
+      self.candidates = candidates
+      self.queues = {}
+
+   # Returns the most preferred candidate for key for which available(candidate)
+   # is true, or None if there is none. Candidates found unavailable are
+   # dropped from the queue for good, so callers must only use this when
+   # unavailability is permanent; the returned candidate stays queued until
+   # taken with take().
+   def best(self, key, available):
+      queue = self._queue(key)
+      while len(queue) > 0:
+         candidate = -queue[0][1]
+         if available(candidate):
+            return candidate
+         heapq.heappop(queue)
+      return None
+
+   # Removes the most preferred candidate of key's queue, as returned by best.
+   def take(self, key):
+      heapq.heappop(self._queue(key))
+
+   # Returns the heap of (-pref, -candidate) pairs for key, building it if
+   # needed.
+   def _queue(self, key):
+      if key not in self.queues:
+         row = self.prefs[key]
+         candidates = self.candidates
+         if candidates == None:
+            candidates = range(len(row))
+         queue = [ (-row[c], -c) for c in candidates ]
+         heapq.heapify(queue)
+         self.queues[key] = queue
+      return self.queues[key]
@@ -0,0 +1,101 @@
+from array import array
+from data import QueueData
+
+# Groups of requests (a queue type and course) with fewer historical durations
+# than this fall back to the distribution of their whole queue type.
+MIN_SAMPLES = 30
+
+# Historical durations longer than this many seconds are treated as abandoned
+# requests and left out of the fit.
+MAX_SECONDS = 3 * 3600
+
+class AliasTable:
+   # Initializes a table for drawing values[i] with probability proportional to
+   # weights[i] in constant time, by Vose's alias method.
+   def __init__(self, values, weights):
+      if len(values) == 0 or len(values) != len(weights):
+         raise ValueError('need one positive weight per value')
+      n = len(values)
+      total = float(sum(weights))
+      scaled = [ w * n / total for w in weights ]
+      self.values = array('d', values)
+      self.probability = array('d', [1.0]) * n
+      self.alias = array('i', range(n))
+      small = [ i for i in range(n) if scaled[i] < 1 ]
+      large = [ i for i in range(n) if scaled[i] >= 1 ]
+      while len(small) > 0 and len(large) > 0:
+         s = small.pop()
+         l = large.pop()
+         self.probability[s] = scaled[s]
+         self.alias[s] = l
+         scaled[l] -= 1 - scaled[s]
+         if scaled[l] < 1:
+            small.append(l)
+         else:
+            large.append(l)
+
+   def __len__(self):
+      return len(self.values)
+
+   # Returns a list of 'count' values drawn from the random number generator
+   # 'rng', using one uniform draw per value.
+   def samples(self, count, rng):
+      n = len(self.values)
+      values = self.values
+      probability = self.probability
+      alias = self.alias
+      result = []
+      for k in xrange(count):
+         x = rng.random() * n
+         i = int(x)
+         result.append(values[i] if x - i < probability[i] else values[alias[i]])
+      return result
+
+class ServiceTimeModel:
+   # Initializes a model of service times fitted to the historical durations
+   # (time_out - time_in, in seconds) of the requests in 'data', a
+   # data.QueueData. Durations are fitted per queue type and course, with
+   # groups of fewer than 'minSamples' durations using their queue type's
+   # distribution, and queue types without durations using all durations.
+   def __init__(self, data, minSamples=MIN_SAMPLES, maxSeconds=MAX_SECONDS):
+      counts = {}
+      for i in xrange(len(data)):
+         duration = data.time_out[i] - data.time_in[i]
+         if 0 < duration <= maxSeconds:
+            queueType = data.categories['queue_type'][data.codes['queue_type'][i]]
+            course = data.categories['course'][data.codes['course'][i]]
+            for key in [(queueType, course), (queueType, None), (None, None)]:
+               group = counts.setdefault(key, {})
+               group[duration] = group.get(duration, 0) + 1
+      if (None, None) not in counts:
+         raise ValueError('No request durations to fit')
+      self.tables = {}
+      for key, group in counts.items():
+         if key == (None, None) or sum(group.values()) >= minSamples:
+            values = sorted(group)
+            self.tables[key] = AliasTable(values, [ group[v] for v in values ])
+
+   # Returns the key of the table that durations of 'request' are drawn from.
+   def tableKey(self, request):
+      for key in [(request.queue_type, request.course),
+                  (request.queue_type, None)]:
+         if key in self.tables:
+            return key
+      return (None, None)
+
+   # Returns an array of service times (in seconds, for a regular TA) for each
+   # of the given requests, drawn from 'rng' in one batch per table.
+   def serviceTimes(self, requests, rng):
+      positions = {}
+      for i in range(len(requests)):
+         positions.setdefault(self.tableKey(requests[i]), []).append(i)
+      result = array('d', [0.0]) * len(requests)
+      for key in sorted(positions, key=str):
+         samples = self.tables[key].samples(len(positions[key]), rng)
+         for i, value in zip(positions[key], samples):
+            result[i] = value
+      return result
+
+# Returns a ServiceTimeModel fitted to the requests in the named TSV file.
+def fitServiceTimes(filename, minSamples=MIN_SAMPLES):
+   return ServiceTimeModel(QueueData(filename), minSamples)
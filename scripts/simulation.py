@@ -1,251 +1,405 @@
-from threading import Timer, Thread, Lock, Condition
-from time import sleep
-from collections import deque
-from data import QueueData
-from sys import stdout
-from random import randint
+from array import array
+from math import ceil
+from random import Random
 from datetime import datetime, timedelta
-
-# Simulation speed multiplier. 1 is real time, which would take roughly 9 hours
-# for a typical day's worth of data.
-SPEED_FACTOR = 9 * 60 * 2
+from events import EventCalendar
+from conf import QUEUE_TYPES
+import instrument, operator, struct
 
 # Senior TA speed multiplier (how much faster senior TAs serve students than
 # normal TAs). 1 is the same amount of time as regular TAs.
 SENIOR_FACTOR = 1.5
 
+# Binary report files begin with this magic string, the number of requests and
+# the length of the comma-separated queue type names that follow. Then come the
+# columns: one signed byte queue type index and two doubles (enqueue and dequeue
+# time) per request.
+REPORT_MAGIC = 'QRP1'
+REPORT_HEADER = '<4sII'
+
+# Dequeue time recorded for requests that have not been served.
+UNSERVED = float('nan')
+
+# Returns a dict with the number of given delays ('count') and their mean,
+# median ('p50'), 90th and 99th percentile and maximum (in seconds). Delay
+# statistics are None if there are no delays. Raises ValueError if a delay is
+# NaN (the delay of a request that was never served).
+def delayStatistics(delays):
+   delays = sorted(delays)
+   if any(delay != delay for delay in delays):
+      raise ValueError('Delay of a request that was never served')
+   stats = { 'count': len(delays) }
+   for key in ['mean', 'p50', 'p90', 'p99', 'max']:
+      stats[key] = None
+   if len(delays) > 0:
+      stats['mean'] = float(sum(delays)) / len(delays)
+      for key, q in [('p50', 0.5), ('p90', 0.9), ('p99', 0.99)]:
+         stats[key] = delays[int(ceil(q * len(delays))) - 1]
+      stats['max'] = delays[-1]
+   return stats
+
+# Range (inclusive, in whole minutes) of the uniformly distributed service time
+# of a request in each queue type.
+HELP_MINUTES = { '2': (3, 6), '10': (8, 12) }
+
 # Returns a service time for a request in give queueType (either '2' or '10')
-# in seconds real time.
-def getHelpTime(queueType):
-   if queueType == '2':
-      return randint(3, 6) * 60
-   else:
-      return randint(8, 12) * 60
+# in seconds, drawn from the random number generator 'rng'.
+def getHelpTime(queueType, rng):
+   low, high = HELP_MINUTES['2' if queueType == '2' else '10']
+   return rng.randint(low, high) * 60
+
+# Returns the mean service time (in seconds) of a request in given queueType
+# drawn by getHelpTime.
+def meanHelpTime(queueType):
+   low, high = HELP_MINUTES['2' if queueType == '2' else '10']
+   return (low + high) * 30.0
 
 class Report:
-   # Initializes the report to store information about the given requests.
-   def __init__(self, requests):
+   # Initializes the report to store information about the given requests,
+   # which must be in the order they are enqueued. Enqueue and dequeue times (in
+   # simulation seconds) are recorded into preallocated arrays indexed by each
+   # request's position in 'requests', and queue types as indices into
+   # 'types'. Dequeue times of requests not served yet are NaN.
+   def __init__(self, requests, types=QUEUE_TYPES):
       self.served = list(requests)
-      self.time_in = {}
-      self.time_out = {}
+      self.types = list(types)
+      self.type = array('b', [ self.types.index(req.queue_type)
+                               for req in self.served ])
+      self.time_in = array('d', [0.0]) * len(self.served)
+      self.time_out = array('d', [UNSERVED]) * len(self.served)
+
+   # Record the enqueue time (in simulation seconds) for the request at the
+   # given position.
+   def recordTimeIn(self, position, time):
+      self.time_in[position] = time
+
+   # Record the dequeue time (in simulation seconds) for the request at the
+   # given position.
+   def recordTimeOut(self, position, time):
+      self.time_out[position] = time
+
+   # Returns the list of positions of requests that were never served.
+   def unserved(self):
+      return [ i for i in xrange(len(self.time_out))
+               if self.time_out[i] != self.time_out[i] ]
 
-   # Record the unqueue time for the given request object at time of call.
-   def recordTimeIn(self, request):
-      self.time_in[request] = datetime.now()
+   # Returns the list of delays (in seconds) between enqueue and dequeue of
+   # every request, ordered by enqueue time. Requests that were never served
+   # are given the delay 'unserved' if it is not None; otherwise they raise
+   # ValueError.
+   def delays(self, unserved=None):
+      delays = map(operator.sub, self.time_out, self.time_in)
+      missing = self.unserved()
+      if len(missing) > 0:
+         if unserved == None:
+            raise ValueError('{0} requests were never served'.format(len(missing)))
+         for i in missing:
+            delays[i] = unserved
+      return delays
 
-   # Record the dequeue time for the given request object at time of call.
-   def recordTimeOut(self, request):
-      self.time_out[request] = datetime.now()
+   # Returns a map from each queue type to the list of delays (in seconds) of
+   # the requests of that type, ordered by enqueue time. 'unserved' is as for
+   # delays.
+   def delaysByType(self, unserved=None):
+      result = dict([ (type, []) for type in self.types ])
+      byCode = [ result[type] for type in self.types ]
+      for code, delay in zip(self.type, self.delays(unserved)):
+         byCode[code].append(delay)
+      return result
 
-   # Print the ledger in tab-separated lines, with each line containing an
-   # original request as well as that request's enqueue time and dequeue time.
-   # Each time is a *real time* lapse from the first enqueue (in seconds).
+   # Returns a map from each queue type to the delayStatistics of its served
+   # requests, with the number of its requests that were never served added
+   # under the key 'unserved'.
+   def summary(self):
+      result = {}
+      for type, delays in self.delaysByType(UNSERVED).items():
+         served = [ delay for delay in delays if delay == delay ]
+         result[type] = delayStatistics(served)
+         result[type]['unserved'] = len(delays) - len(served)
+      return result
+
+   # Print the ledger in lines, with each line containing the delay (in
+   # seconds) between one request's enqueue time and dequeue time. Lines are
+   # ordered by enqueue time.
    def printTSV(self, file=None):
-      def write(line):
-         if file == None:
-            print line
-         else:
-            file.write(line + '\n')
-      requests = sorted(self.served, key=lambda req : self.time_in[req])
-      first = min([ self.time_in[req] for req in requests ])
-      #write('request\ttime in\ttime out')
-      for req in requests:
-         adjIn = self._adjust(self.time_in[req], first)
-         adjOut = self._adjust(self.time_out[req], first)
-         #write('\t'.join(map(str, [req, adjIn, adjOut])))
-         write(str(adjOut - adjIn))
-
-   # Convert a simulation 'time' record into real seconds since 'offset' (also
-   # in simulation time).
-   def _adjust(self, time, offset):
-      diff = time - offset
-      simSeconds = diff.seconds + float(diff.microseconds) / 1000000
-      return simSeconds * SPEED_FACTOR
-
-class DoubleQueue:
-   def __init__(self, breakTies):
-      self.queues = {
-         '2': deque(),
-         '10': deque()
-      }
-      self.lock = Lock()
+      lines = '\n'.join(map(str, self.delays()))
+      if file == None:
+         print lines
+      else:
+         file.write(lines + '\n')
+
+   # Writes the report's queue types and its type, enqueue time and dequeue
+   # time columns to the named binary file.
+   def write(self, filename):
+      types = ','.join(self.types)
+      file = open(filename, 'wb')
+      try:
+         file.write(struct.pack(REPORT_HEADER, REPORT_MAGIC, len(self.served),
+                                len(types)))
+         file.write(types)
+         self.type.tofile(file)
+         self.time_in.tofile(file)
+         self.time_out.tofile(file)
+      finally:
+         file.close()
+
+# Returns a Report holding the columns of the named binary file written by
+# Report.write. Its 'served' list is empty, as requests are not stored.
+def readReport(filename):
+   file = open(filename, 'rb')
+   try:
+      header = file.read(struct.calcsize(REPORT_HEADER))
+      magic, count, typesLength = struct.unpack(REPORT_HEADER, header)
+      if magic != REPORT_MAGIC:
+         raise ValueError('Not a report file: ' + filename)
+      report = Report([], file.read(typesLength).split(','))
+      for column in [report.type, report.time_in, report.time_out]:
+         column.fromfile(file, count)
+   finally:
+      file.close()
+   return report
+
+class RequestQueue:
+   # Initializes empty queues, one for each of the given queue types. Each
+   # queue keeps its items (the simulator uses request positions) in a list and
+   # their enqueue times (in simulation seconds) inline in a parallel array,
+   # with dequeued entries trimmed off the front in batches. 'breakTies'
+   # chooses between queues as described in Simulator.run.
+   def __init__(self, breakTies, types=QUEUE_TYPES):
+      self.types = list(types)
       self.breakTies = breakTies
+      self.items = dict([ (type, []) for type in self.types ])
+      self.times = dict([ (type, array('d')) for type in self.types ])
+      self.heads = dict([ (type, 0) for type in self.types ])
+      self.size = 0
 
-   # Returns true if both queues are empty, false otherwise.
+   # Returns true if all queues are empty, false otherwise.
    def empty(self):
-      with self.lock:
-         return self._unsafe_empty()
-
-   # Dequeue and return a single request from one of the queues. The report
-   # should contain a time_in entry for every request currently in the queue. 
-   def get(self, report):
-      # Returns the current wait time of the oldest request in the queue with
-      # given type.
-      def wait(queue_type):
-         delta = datetime.now() - report.time_in[self.queues[queue_type][0]]
-         return delta.seconds + float(delta.microseconds) / 1000000
-
-      with self.lock:
-         if self._unsafe_empty():
-            return None
-         elif len(self.queues['2']) == 0:
-            return self.queues['10'].popleft()
-         elif len(self.queues['10']) == 0:
-            return self.queues['2'].popleft()
-         else:
-            choice = self.breakTies(wait('2')  * SPEED_FACTOR,
-                                    wait('10') * SPEED_FACTOR)
-            return self.queues[choice].popleft()
+      return self.size == 0
+
+   # Returns the number of items waiting in the queue with given type.
+   def length(self, type):
+      return len(self.items[type]) - self.heads[type]
+
+   # Returns how long (in seconds) the oldest item in the queue with given type
+   # has waited at simulation time 'now', or None if the queue is empty.
+   def headWait(self, type, now):
+      head = self.heads[type]
+      if head == len(self.items[type]):
+         return None
+      return now - self.times[type][head]
+
+   # Returns the list of head waits at simulation time 'now' of every queue, in
+   # order of queue type.
+   def headWaits(self, now):
+      return [ self.headWait(type, now) for type in self.types ]
 
-   # Enqueue the request in the appropriate queue.
-   def put(self, request):
-      with self.lock:
-         self.queues[request.queue_type].append(request)
+   # Dequeue and return a single item from one of the queues at simulation time
+   # 'now', or None if all queues are empty. If more than one queue holds
+   # items, breakTies is called with the head waits of every queue.
+   def get(self, now):
+      waiting = [ type for type in self.types if self.length(type) > 0 ]
+      if len(waiting) == 0:
+         return None
+      elif len(waiting) == 1:
+         return self._pop(waiting[0])
+      else:
+         return self._pop(self.breakTies(*self.headWaits(now)))
 
-   # Returns true if both queues are empty, false otherwise. Does not acquire
-   # lock before check.
-   def _unsafe_empty(self):
-      return len(self.queues['2']) == 0 and len(self.queues['10']) == 0
+   # Enqueue the item in the queue with given type at simulation time 'now'.
+   def put(self, item, type, now):
+      self.items[type].append(item)
+      self.times[type].append(now)
+      self.size += 1
+
+   # Dequeues and returns the oldest item in the queue with given type.
+   def _pop(self, type):
+      items = self.items[type]
+      head = self.heads[type]
+      item = items[head]
+      head += 1
+      # Trim dequeued entries once they make up most of the queue, so each
+      # entry is moved at most a constant number of times on average.
+      if head * 2 > len(items) and head >= 32:
+         del items[:head]
+         del self.times[type][:head]
+         head = 0
+      self.heads[type] = head
+      self.size -= 1
+      return item
 
 class Simulator:
-   # Stores the given list of data.QueueRequest objects. 
-   def __init__(self, requests):
+   # Stores the given list of data.QueueRequest objects. Service times are
+   # drawn from a random number generator seeded with 'seed', so two runs with
+   # the same seed and tie-breaking policy produce the same report. If given,
+   # 'serviceModel' (a service.ServiceTimeModel) supplies the service times of
+   # all requests in one batch per run; otherwise getHelpTime is used.
+   def __init__(self, requests, seed=None, serviceModel=None):
       self.buffer = sorted(requests, key=lambda req : req.time_in)
-      self.buffer.reverse()
-      self.cv = Condition()
-      self.requestsLeft = 0
-
-   # Run simulation threads.
-   # 'finishedCallback' is called once when all simulation
-   #    threads finish.
-   # 'breakTies' is a function of two arguments (two minute wait time, ten
-   #    minute queue wait time) called with the wait times of the head of either
-   #    queue whenever both queues contain requests. Should return either '2' or
-   #    '10' to indicate the queue from which to dequeue.
+      self.random = Random(seed)
+      self.serviceModel = serviceModel
+
+   # Run the simulation of a single day to completion on a virtual clock.
+   # 'finishedCallback' is called once with the report when the simulation
+   #    finishes. The report is also returned.
+   # 'breakTies' is a function taking one argument per queue type in
+   #    QUEUE_TYPES order (for '2' and '10', the two minute and ten minute queue
+   #    wait times) called with the wait times of the head of every queue,
+   #    None for empty queues, whenever more than one queue contains requests.
+   #    Should return the queue type (e.g. '2' or '10') to dequeue from. The
+   #    simulator's 'queue' attribute is the RequestQueue, for policies that
+   #    look at the whole queue state.
    # 'regularReqts' and 'seniorReqts' are lists of required regular and senior
    #    TAs for time slot, sorted in lists by hour.
    def run(self, finishedCallback, breakTies, regularReqts, seniorReqts):
-      self.queue = DoubleQueue(breakTies)
-      self.report = Report(self.buffer)
-      self.finished = finishedCallback
-      self.regularSurplus = 0
-      self.seniorSurplus = 0
-      timers = self.scheduleRequests()
-      timers += self.scheduleReqtChanges(regularReqts, seniorReqts)
-      initialRegular = regularReqts[0]
-      initialSenior = seniorReqts[0]
-      for i in range(initialRegular + initialSenior):
-         Thread(target=self.serve, args=(i >= initialRegular,)).start()
-      for t in timers:
-         t.start()
-
-   # Attempt to serve incoming requests until none are left.
-   def serve(self, senior=False):
-      # Print a message above a TA beginning or ending work.
-      def printChange(action):
-         print '{0} TA {1}.'.format('Senior' if senior else 'Normal', action) 
-
-      # Print a message noting that the given request has been served.
-      def printServed(request):
-         params = (request, self.requestsLeft)
-         print 'served request %s. %d requests left.' % params
-
-      printChange('beginning')
-      while self.requestsLeft > 0:
-         with self.cv:
-            while self.queue.empty() and self.requestsLeft > 0:
-               self.cv.wait()
-            if self._handleSurplus(senior):
-               printChange('finishing')
-               return
-            request = self.queue.get(self.report)
-         if request != None:
-            self.requestsLeft -= 1
-            printServed(request)
-            # Help the student for exactly the amount of time for that queue (2
-            # minutes or 10 minutes).
-            self.report.recordTimeOut(request)
-            workingTime = float(getHelpTime(request.queue_type)) / SPEED_FACTOR
-            if senior:
-               workingTime /= SENIOR_FACTOR
-            sleep(workingTime)
-
-      # No more requests are coming, so every TA should exit.
-      with self.cv:
-         self.cv.notifyAll()
-         # Call the finished callback exactly once.
-         self.finished(self.report)
-         self.finished = lambda x : None
-
-   # Schedule changes in the number of TAs required at various times in the day.
-   # Each returned timer fires at a certain hour, incrementing or decrementing
-   # the regular or senior TA requirements.
-   def scheduleReqtChanges(self, regularReqts, seniorReqs):
-      # Returns a sequence of differences between consecutive elts in 'reqs'.
-      def getDeltas(reqs):
-         deltas = []
-         for i in range(1, len(reqs)):
-            deltas.append(reqs[i - 1] - reqs[i])
-         return deltas
-      timers = []
-      deltas = zip(getDeltas(regularReqts), getDeltas(seniorReqs))
-      hour = 1
-      for total, senior in deltas:
-         time = float(hour * 3600) / SPEED_FACTOR
-         timers.append(Timer(time, self.changeSurplus, args=(total, senior)))
-         hour += 1
-      return timers
-
-   # If any surplus (senior or regular) is greater than 0, spins up that many
-   # worker threads and resets surpluses to 0. If either surplus is positive,
-   # then the current worker resets a surplus to 0 (whichever matches it's type)
-   # and returns True. Otherwise returns False.
-   def _handleSurplus(self, senior):
-      # Create TA threads to satisfy needs.
-      while self.seniorSurplus < 0:
-         self.seniorSurplus += 1
-         Thread(target=self.serve, args=(True,)).start()
-      while self.regularSurplus < 0:
-         self.regularSurplus += 1
-         Thread(target=self.serve, args=(False,)).start()
-
-      # Return true to indicate "leaving work" if no longer needed.
-      if self.seniorSurplus > 1 and senior:
-         self.seniorSurplus -= 1
-         return True
-      if self.regularSurplus > 1 and not senior:
-         self.regularSurplus -= 1
-         return True
-      return False
-
-   # Changes the total and senior TA surplus by the provided deltas.
-   def changeSurplus(self, totalChange, seniorChange):
-      with self.cv:
-         print 'Staffing change: ({0}, {1}).'.format(totalChange, seniorChange)
-         self.regularSurplus += totalChange
-         self.seniorSurplus += seniorChange
-
-   # Schedules the request times. Returns a list of timers, one per request.
-   # Once started, each request is made at the times specified in the request's
-   # 'time_in' field relative to the first request (which is made immediately).
-   def scheduleRequests(self):
+      return self.runDays(finishedCallback, breakTies,
+                          lambda date : (regularReqts, seniorReqts))
+
+   # Run the simulation of every day from the first to the last request's day
+   # as one continuous stream of events. Arguments are as for run, except that
+   # 'staffing' is a function of a datetime.date returning the pair
+   #    (regularReqts, seniorReqts) for that day, or None if nobody works that
+   #    day. Each day's staffing starts at noon, and the last hour's staffing
+   #    stays on until the next day's starts, so a backed up queue drains. On
+   #    a day nobody works, the staff of the day before leaves at noon.
+   def runDays(self, finishedCallback, breakTies, staffing):
       if len(self.buffer) == 0:
          raise ValueError('No requests to schedule!')
-      self.requestsLeft = len(self.buffer)
+      self.calendar = EventCalendar()
+      self.queue = RequestQueue(breakTies)
+      self.report = Report(self.buffer)
+      # Idle TAs and TAs due to leave once they finish, keyed on seniority.
+      self.idle = { False: 0, True: 0 }
+      self.surplus = { False: 0, True: 0 }
+      self.required = (0, 0)
+      self.busy = 0
+      self.instruments = instrument.current
+      self.serviceTimes = None
+      if self.serviceModel != None:
+         self.serviceTimes = self.serviceModel.serviceTimes(self.buffer,
+                                                            self.random)
+
+      # Each day's opening staff is scheduled before the day's requests, and
+      # hourly changes after, so that ties in time resolve the same way.
+      days = []
+      first = self.buffer[0].time_in.date()
+      for i in range((self.buffer[-1].time_in.date() - first).days + 1):
+         reqts = staffing(first + timedelta(days=i))
+         if reqts == None:
+            reqts = ([0], [0])
+         self.calendar.schedule(i * 86400, self.setReqts, reqts[0][0],
+                                reqts[1][0])
+         days.append((i * 86400, reqts))
+      self.scheduleRequests()
+      for opening, (regularReqts, seniorReqts) in days:
+         self.scheduleReqtChanges(regularReqts, seniorReqts, opening)
+      with instrument.phase('simulate'):
+         self.calendar.run()
+      finishedCallback(self.report)
+      return self.report
+
+   # Hands queued requests to idle TAs until either runs out. Idle senior TAs
+   # are put to work first since they serve requests faster.
+   def dispatch(self):
+      while not self.queue.empty():
+         if self.idle[True] > 0:
+            self.serve(True)
+         elif self.idle[False] > 0:
+            self.serve(False)
+         else:
+            return
+
+   # Dequeues a request to be served by an idle TA of given seniority, and
+   # schedules the TA to finish after the request's service time.
+   def serve(self, senior):
+      now = self.calendar.now
+      position = self.queue.get(now)
+      self.report.recordTimeOut(position, now)
+      self.idle[senior] -= 1
+      self.busy += 1
+      if self.instruments != None:
+         self.instruments.count('served')
+      if self.serviceTimes != None:
+         workingTime = self.serviceTimes[position]
+      else:
+         queueType = self.buffer[position].queue_type
+         workingTime = float(getHelpTime(queueType, self.random))
+      if senior:
+         workingTime /= SENIOR_FACTOR
+      self.calendar.schedule(now + workingTime, self.finishServing, senior)
+
+   # A TA of given seniority finishes serving a request, and either leaves (if
+   # no longer needed) or picks up the next request.
+   def finishServing(self, senior):
+      self.busy -= 1
+      if self.surplus[senior] > 0:
+         self.surplus[senior] -= 1
+      else:
+         self.idle[senior] += 1
+         self.dispatch()
+      if self.instruments != None:
+         self.record()
+
+   # Schedule changes in the number of TAs required at each hour after the
+   # first of a day that opens at simulation time 'opening'.
+   def scheduleReqtChanges(self, regularReqts, seniorReqts, opening=0):
+      for hour in range(1, len(regularReqts)):
+         self.calendar.schedule(opening + hour * 3600, self.setReqts,
+                                regularReqts[hour], seniorReqts[hour])
+
+   # Sets the number of regular and senior TAs required from now on.
+   def setReqts(self, regular, senior):
+      self.changeSurplus(self.required[0] - regular, self.required[1] - senior)
+      self.required = (regular, senior)
+      if self.instruments != None:
+         self.instruments.count('staffing_changes')
+         self.record()
+
+   # Changes the regular and senior TA surplus by the provided deltas. Needed
+   # TAs start immediately, and idle TAs that are no longer needed leave
+   # immediately. Busy TAs that are no longer needed leave once they finish.
+   def changeSurplus(self, regularChange, seniorChange):
+      for senior, change in [(False, regularChange), (True, seniorChange)]:
+         self.surplus[senior] += change
+         if self.surplus[senior] < 0:
+            self.idle[senior] -= self.surplus[senior]
+            self.surplus[senior] = 0
+         leaving = min(self.idle[senior], self.surplus[senior])
+         self.idle[senior] -= leaving
+         self.surplus[senior] -= leaving
+      self.dispatch()
+
+   # Schedules the request arrivals. Each request is made at the time specified
+   # in the request's 'time_in' field relative to noon on the day of the first
+   # request. Requests made before noon are made at noon that day.
+   def scheduleRequests(self):
       # Start simulation at noon.
-      first = self.buffer[len(self.buffer) - 1].time_in
+      first = self.buffer[0].time_in
       first = datetime.combine(first.date(), datetime.min.time())
       first += timedelta(hours=12)
-      timers = []
-      for req in self.buffer:
-         time = float((req.time_in - first).seconds) / SPEED_FACTOR
-         timers.append(Timer(time, self.makeRequest, (req,)))
-      return timers
-
-   # Adds the given request to either the two-minute or ten-minute queue
-   # depending on the type of the request.
-   def makeRequest(self, request):
-      with self.cv:
-         self.report.recordTimeIn(request)
-         self.queue.put(request)
-         self.cv.notify()
+      for position in range(len(self.buffer)):
+         delta = self.buffer[position].time_in - first
+         opening = (delta.days + (delta.seconds >= 43200)) * 86400
+         time = max(opening, delta.days * 86400 + delta.seconds)
+         self.calendar.schedule(time, self.makeRequest, position)
+
+   # Adds the request at the given position in the buffer to the queue for the
+   # request's type. Requests are made in buffer order, so the report's
+   # positions are in enqueue order.
+   def makeRequest(self, position):
+      now = self.calendar.now
+      self.report.recordTimeIn(position, now)
+      self.queue.put(position, self.buffer[position].queue_type, now)
+      self.dispatch()
+      if self.instruments != None:
+         self.instruments.count('requests')
+         self.record()
+
+   # Records the queue length, busy TAs and TAs on shift (busy or idle) from
+   # now on, for instrumentation.
+   def record(self):
+      now = self.calendar.now
+      self.instruments.level('queue_depth', self.queue.size, now)
+      self.instruments.level('busy_tas', self.busy, now)
+      self.instruments.level('present_tas',
+                             self.busy + self.idle[False] + self.idle[True], now)
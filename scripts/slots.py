@@ -0,0 +1,106 @@
+from conf import DAY_NAMES, HOURS
+
+class DayView:
+   # Initializes a view of the 'length' entries of the flat sequence 'vector'
+   # starting at 'offset'. Nothing is copied; reads and writes go through to
+   # the underlying sequence.
+   def __init__(self, vector, offset, length):
+      self.vector = vector
+      self.offset = offset
+      self.length = length
+
+   def __len__(self):
+      return self.length
+
+   # Returns the index into the underlying sequence of hour 'i' of the view.
+   def _index(self, i):
+      if i < 0:
+         i += self.length
+      if not 0 <= i < self.length:
+         raise IndexError('hour index out of range')
+      return self.offset + i
+
+   def __getitem__(self, i):
+      return self.vector[self._index(i)]
+
+   def __setitem__(self, i, value):
+      self.vector[self._index(i)] = value
+
+   def __iter__(self):
+      for i in xrange(self.offset, self.offset + self.length):
+         yield self.vector[i]
+
+   def __eq__(self, other):
+      return list(self) == list(other)
+
+   def __ne__(self, other):
+      return not self == other
+
+   def __repr__(self):
+      return repr(list(self))
+
+class SlotIndex:
+   # Initializes an index of the flat time slot numbering, in which the hours of
+   # each day in 'days' (in that order) are numbered consecutively. 'hours' maps
+   # each day to its number of hours.
+   def __init__(self, days=DAY_NAMES, hours=HOURS):
+      self.days = list(days)
+      self.hours = dict([ (day, hours[day]) for day in self.days ])
+      self.offsets = {}
+      self.dayHours = []
+      for day in self.days:
+         self.offsets[day] = len(self.dayHours)
+         self.dayHours += [ (day, hour) for hour in range(self.hours[day]) ]
+
+   def __len__(self):
+      return len(self.dayHours)
+
+   # Returns the flat slot index of the given hour (0 being the first hour) of
+   # the given day.
+   def slot(self, day, hour):
+      if not 0 <= hour < self.hours[day]:
+         raise IndexError('no hour {0} on {1}'.format(hour, day))
+      return self.offsets[day] + hour
+
+   # Returns the (day, hour) pair of the given flat slot index.
+   def dayHour(self, slot):
+      return self.dayHours[slot]
+
+   # Returns a readable name for the given flat slot index.
+   def label(self, slot):
+      day, hour = self.dayHours[slot]
+      return '{0} hour {1}'.format(day, hour)
+
+   # Returns a DayView of the given day's entries in the flat per-slot 'vector'.
+   def view(self, vector, day):
+      return DayView(vector, self.offsets[day], self.hours[day])
+
+   # Returns a dict mapping each day to a DayView of the flat 'vector'.
+   def views(self, vector):
+      return dict([ (day, self.view(vector, day)) for day in self.days ])
+
+   # Returns a flat per-slot list of the values in 'dayMap', a dict keyed on
+   # day with a list of per-hour values for each day.
+   def flatten(self, dayMap):
+      result = []
+      for day in self.days:
+         if len(dayMap[day]) != self.hours[day]:
+            raise ValueError('expected {0} hours on {1}'.format(self.hours[day], day))
+         result += dayMap[day]
+      return result
+
+   # Returns a dict keyed on day with a list of per-hour values for each day,
+   # copied from the flat per-slot 'vector'.
+   def unflatten(self, vector):
+      if len(vector) != len(self):
+         raise ValueError('expected {0} slots'.format(len(self)))
+      return dict([ (day, list(self.view(vector, day))) for day in self.days ])
+
+# Order of the days in the slot numbering of existing preference files, which
+# were written in the iteration order of a dict keyed on day names. Kept so
+# that those files load with their hours in the right slots.
+LEGACY_DAYS = ['Monday', 'Tuesday', 'Friday', 'Wednesday', 'Thursday',
+               'Sunday', 'Saturday']
+
+# The slot numbering shared by preference files, quotas and schedules.
+SLOTS = SlotIndex(LEGACY_DAYS)
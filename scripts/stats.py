@@ -0,0 +1,144 @@
+from math import sqrt
+
+# Normal quantile for two-sided 95% confidence intervals.
+Z_95 = 1.96
+
+class RunningStats:
+   # Initializes an empty accumulator. Values are added one at a time using
+   # Welford's method, so the mean and variance are available at any point
+   # without storing the values.
+   def __init__(self):
+      self.count = 0
+      self.mean = 0.0
+      self.m2 = 0.0
+
+   # Adds a single value to the accumulator.
+   def add(self, value):
+      self.count += 1
+      delta = value - self.mean
+      self.mean += delta / self.count
+      self.m2 += delta * (value - self.mean)
+
+   # Returns the sample variance of values added so far, or 0 if fewer than two
+   # values have been added.
+   def variance(self):
+      if self.count < 2:
+         return 0.0
+      return self.m2 / (self.count - 1)
+
+   # Returns a pair (low, high) bounding the confidence interval of the mean,
+   # using the normal approximation with quantile z.
+   def confidenceInterval(self, z=Z_95):
+      if self.count == 0:
+         return (None, None)
+      halfWidth = z * sqrt(self.variance() / self.count)
+      return (self.mean - halfWidth, self.mean + halfWidth)
+
+class QuantileSketch:
+   # Initializes an empty estimator of the q-quantile (0 < q < 1) of a stream of
+   # values, using the P-squared algorithm of Jain and Chlamtac: five markers
+   # are kept and adjusted by piecewise parabolic interpolation as values are
+   # added, so memory is constant.
+   def __init__(self, q):
+      if not 0 < q < 1:
+         raise ValueError('quantile must be between 0 and 1')
+      self.q = q
+      self.count = 0
+      self.heights = []
+      self.positions = [1, 2, 3, 4, 5]
+      self.desired = [1, 1 + 2 * q, 1 + 4 * q, 3 + 2 * q, 5]
+      self.increments = [0, q / 2, q, (1 + q) / 2, 1]
+
+   # Adds a single value to the estimator.
+   def add(self, value):
+      self.count += 1
+      if self.count <= 5:
+         self.heights.append(value)
+         self.heights.sort()
+         return
+
+      h = self.heights
+      if value < h[0]:
+         h[0] = value
+         k = 0
+      elif value >= h[4]:
+         h[4] = value
+         k = 3
+      else:
+         k = 0
+         while value >= h[k + 1]:
+            k += 1
+      for i in range(k + 1, 5):
+         self.positions[i] += 1
+      for i in range(5):
+         self.desired[i] += self.increments[i]
+
+      # Move the middle markers towards their desired positions.
+      n = self.positions
+      for i in range(1, 4):
+         d = self.desired[i] - n[i]
+         if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+            d = 1 if d > 0 else -1
+            height = self._parabolic(i, d)
+            if not h[i - 1] < height < h[i + 1]:
+               height = h[i] + d * (h[i + d] - h[i]) / float(n[i + d] - n[i])
+            h[i] = height
+            n[i] += d
+
+   # Returns the current estimate of the quantile, or None if no values have
+   # been added. With five or fewer values, the exact sample quantile is
+   # returned.
+   def value(self):
+      if self.count == 0:
+         return None
+      if self.count <= 5:
+         return self.heights[int(round(self.q * (self.count - 1)))]
+      return self.heights[2]
+
+   # Returns the parabolic prediction of the height of marker i moved by d.
+   def _parabolic(self, i, d):
+      h = self.heights
+      n = self.positions
+      return h[i] + float(d) / (n[i + 1] - n[i - 1]) * \
+         ((n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / float(n[i + 1] - n[i]) +
+          (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / float(n[i] - n[i - 1]))
+
+class VectorStats:
+   # Initializes an empty accumulator of vectors, keeping RunningStats for each
+   # vector index, and a QuantileSketch for each index and each quantile in
+   # 'quantiles'.
+   def __init__(self, quantiles=()):
+      self.quantileLevels = list(quantiles)
+      self.stats = []
+      self.sketches = []
+
+   # Adds the vector of values, where the ith value is added to the statistics
+   # of index i. Vectors need not have equal lengths, and may be any iterable
+   # (such as a generator over the lines of a file), which is consumed one
+   # value at a time.
+   def add(self, vector):
+      for i, value in enumerate(vector):
+         if i == len(self.stats):
+            self.stats.append(RunningStats())
+            self.sketches.append([ QuantileSketch(q) for q in self.quantileLevels ])
+         self.stats[i].add(value)
+         for sketch in self.sketches[i]:
+            sketch.add(value)
+
+   # Returns the vector of means, one per index.
+   def means(self):
+      return [ s.mean for s in self.stats ]
+
+   # Returns the vector of sample variances, one per index.
+   def variances(self):
+      return [ s.variance() for s in self.stats ]
+
+   # Returns the vector of (low, high) confidence intervals, one per index.
+   def confidenceIntervals(self, z=Z_95):
+      return [ s.confidenceInterval(z) for s in self.stats ]
+
+   # Returns the vector of estimated q-quantiles, one per index. q must be one
+   # of the quantiles the accumulator was initialized with.
+   def quantiles(self, q):
+      level = self.quantileLevels.index(q)
+      return [ sketches[level].value() for sketches in self.sketches ]
@@ -0,0 +1,270 @@
+from sys import argv, exit
+from multiprocessing import Pool, cpu_count
+from data import QueueData
+from conf import DAY_NAMES
+from simulation import Simulator
+from policies import crisisThresholdsAndFlip, parameterGrid
+from problem import getConfig
+import events, hashlib, os, policies, simulation
+try:
+   import cPickle as pickle
+except ImportError:
+   import pickle
+
+# Policy parameter values to sweep: crisis thresholds (in seconds) for the two
+# and ten minute queues, and odds in favor of the two minute queue.
+TWO_MIN_THRESHOLDS = [ 5 * 60, 10 * 60, 15 * 60, 20 * 60 ]
+TEN_MIN_THRESHOLDS = [ 20 * 60, 30 * 60, 40 * 60, 60 * 60 ]
+TWO_MIN_PREFS = [ 1, 1.5, 2, 3 ]
+
+# Numbers of regular TAs added to (or removed from) every hour's quota.
+QUOTA_OFFSETS = [ -1, 0, 1 ]
+
+# Successive halving keeps the best 1 / HALVING_RATE candidates of each round,
+# and evaluates the survivors with HALVING_RATE times as many seeds.
+HALVING_RATE = 3
+
+# Bumped whenever the meaning of cached results changes, so that cache files
+# written by older code are ignored.
+CACHE_VERSION = 2
+
+# Modules whose source code determines simulation results.
+SIMULATION_MODULES = [ events, policies, simulation ]
+
+# Day configuration of a worker process, set once per process by _initWorker.
+_days = None
+
+# Stores the day configuration in a worker process.
+def _initWorker(days):
+   global _days
+   _days = days
+
+# Runs one simulation of the day with key 'day' for the given candidate and
+# seed, and returns the pair (key, sums) where key is (candidate, day, seed)
+# and sums maps each queue type to the (total delay, count) of its requests.
+# Requests that are never served, for example because the quota offset leaves
+# an hour without TAs, count as infinitely delayed.
+def _evaluate(key):
+   (policyParams, offset), day, seed = key
+   requests, regular, senior = _days[day]
+   regular = map(lambda x : max(0, x + offset), regular)
+   sim = Simulator(requests, seed=seed)
+   policy = crisisThresholdsAndFlip(*policyParams, rng=sim.random)
+   report = sim.run(lambda report : None, policy, regular, senior)
+   sums = {}
+   for type, delays in report.delaysByType(float('inf')).items():
+      sums[type] = (sum(delays), len(delays))
+   return key, sums
+
+# Returns a digest of the source code of SIMULATION_MODULES.
+def codeVersion():
+   digest = hashlib.md5()
+   for module in SIMULATION_MODULES:
+      with open(os.path.splitext(module.__file__)[0] + '.py', 'rb') as file:
+         digest.update(file.read())
+   return digest.hexdigest()
+
+# Returns a stamp of everything cached results of the given sweep days (as
+# for Sweep, keyed on (filename, week, day)) depend on besides their keys: the
+# cache version, the simulation code, each day's TA requirements, and the
+# modification time and size of each request file.
+def resultStamp(days):
+   files = sorted(set([ day[0] for day in days ]))
+   return (CACHE_VERSION, codeVersion(),
+           sorted([ (day, list(regular), list(senior))
+                    for day, (requests, regular, senior) in days.items() ]),
+           [ (name, os.stat(name).st_mtime, os.stat(name).st_size)
+             for name in files ])
+
+class ResultCache:
+   # Initializes a cache of simulation results keyed on (candidate, day, seed),
+   # loaded from and saved to the pickle file 'filename' if one is given.
+   # Results are only loaded if they were saved with the same 'stamp' (see
+   # resultStamp).
+   def __init__(self, filename=None, stamp=None):
+      self.filename = filename
+      self.stamp = stamp
+      self.results = {}
+      if filename != None and os.path.exists(filename):
+         with open(filename, 'rb') as file:
+            saved = pickle.load(file)
+         if isinstance(saved, tuple) and saved[0] == self.stamp:
+            self.results = saved[1]
+
+   def __contains__(self, key):
+      return key in self.results
+
+   def __getitem__(self, key):
+      return self.results[key]
+
+   def __setitem__(self, key, sums):
+      self.results[key] = sums
+
+   # Writes the cache to its file, if it has one.
+   def save(self):
+      if self.filename != None:
+         with open(self.filename, 'wb') as file:
+            pickle.dump((self.stamp, self.results), file,
+                        pickle.HIGHEST_PROTOCOL)
+
+class Sweep:
+   # Initializes a sweep over the days in 'days', a map from a day key to the
+   # triple (requests, regular, senior) of the day's requests and hourly
+   # regular and senior TA requirements. Simulations are spread over
+   # 'processes' worker processes (all cores if None), and results are kept in
+   # 'cache' (a ResultCache).
+   def __init__(self, days, processes=None, cache=None):
+      self.days = days
+      self.processes = processes if processes != None else cpu_count()
+      self.cache = cache if cache != None else ResultCache()
+      self.pool = None
+
+   # Runs every simulation in 'keys' that is not already cached.
+   def run(self, keys):
+      missing = [ key for key in keys if key not in self.cache ]
+      if len(missing) == 0:
+         return
+      if self.processes == 1:
+         _initWorker(self.days)
+         results = map(_evaluate, missing)
+      else:
+         if self.pool == None:
+            self.pool = Pool(self.processes, _initWorker, (self.days,))
+         results = self.pool.imap_unordered(_evaluate, missing)
+      for key, sums in results:
+         self.cache[key] = sums
+      self.cache.save()
+
+   # Returns a map from each queue type to the mean delay (in seconds) of its
+   # requests across all days and the given seeds for the given candidate.
+   def meanDelays(self, candidate, seeds):
+      totals = {}
+      for day in self.days:
+         for seed in seeds:
+            for type, (total, count) in self.cache[(candidate, day, seed)].items():
+               old = totals.get(type, (0, 0))
+               totals[type] = (old[0] + total, old[1] + count)
+      return dict([ (type, float(total) / count if count > 0 else 0.0)
+                    for type, (total, count) in totals.items() ])
+
+   # Evaluates all candidates on 'seeds' and returns a map from each candidate
+   # to its mean delays.
+   def evaluate(self, candidates, seeds):
+      self.run([ (candidate, day, seed) for candidate in candidates
+                 for day in self.days for seed in seeds ])
+      return dict([ (candidate, self.meanDelays(candidate, seeds))
+                    for candidate in candidates ])
+
+   # Searches the candidates (pairs of policy parameters and quota offset) by
+   # successive halving, starting with 'seeds' seeds per candidate and day and
+   # going on until at most 'survivors' candidates remain for each quota
+   # offset. Candidates are ranked within their quota offset by Pareto rank on
+   # mean two and ten minute delay, then by the sum of both. Returns a map
+   # from each surviving candidate to its mean delays on the final seeds.
+   def halve(self, candidates, seeds, survivors=3, callback=None):
+      seeds = list(seeds)
+      while True:
+         results = self.evaluate(candidates, seeds)
+         if callback != None:
+            callback(candidates, seeds)
+         byOffset = {}
+         for candidate in candidates:
+            byOffset.setdefault(candidate[1], []).append(candidate)
+         if max(map(len, byOffset.values())) <= survivors:
+            return results
+         candidates = []
+         for group in byOffset.values():
+            keep = max(survivors, len(group) / HALVING_RATE)
+            candidates += rankCandidates(group, results)[:keep]
+         more = len(seeds) * (HALVING_RATE - 1)
+         seeds += range(max(seeds) + 1, max(seeds) + 1 + more)
+
+   # Stops the worker processes.
+   def close(self):
+      if self.pool != None:
+         self.pool.terminate()
+         self.pool = None
+
+# Returns the candidates sorted by Pareto rank on the (two minute, ten minute)
+# mean delays in 'results', ties broken by the sum of both delays.
+def rankCandidates(candidates, results):
+   points = dict([ (c, (results[c]['2'], results[c]['10'])) for c in candidates ])
+   rank = {}
+   remaining = list(candidates)
+   level = 0
+   while len(remaining) > 0:
+      front = paretoFront(remaining, points)
+      for c in front:
+         rank[c] = level
+      front = set(front)
+      remaining = [ c for c in remaining if c not in front ]
+      level += 1
+   return sorted(candidates, key=lambda c : (rank[c], sum(points[c])))
+
+# Returns the candidates whose points (tuples to be minimized) are not dominated
+# by the point of any other candidate.
+def paretoFront(candidates, points):
+   def dominates(p, q):
+      return all(a <= b for a, b in zip(p, q)) and p != q
+   return [ c for c in candidates
+            if not any(dominates(points[d], points[c]) for d in candidates) ]
+
+# Returns the list of candidates (policyParams, quotaOffset) of the full grid.
+def candidateGrid():
+   grid = parameterGrid(TWO_MIN_THRESHOLDS, TEN_MIN_THRESHOLDS, TWO_MIN_PREFS)
+   return [ (params, offset) for offset in QUOTA_OFFSETS for params in grid ]
+
+# Report correct usage and exit gracefully.
+def usageError():
+   exit('Usage: <request_file_tsv> <week> <day>[,<day>...] [seeds] ' +
+        '[processes] [cache_file]')
+
+if __name__ == '__main__':
+   try:
+      filename = argv[1]
+      week = int(argv[2])
+      dayNames = argv[3].split(',')
+      seeds = int(argv[4]) if len(argv) > 4 else 2
+      processes = int(argv[5]) if len(argv) > 5 else None
+      cacheFile = argv[6] if len(argv) > 6 else None
+      if not all(day in DAY_NAMES for day in dayNames):
+         usageError()
+   except:
+      usageError()
+
+   # Set up the days to simulate, with quotas from data/quotas.txt.
+   config = getConfig('data')
+   slots = config['slots']
+   byWeek = QueueData(filename).byWeek()
+   days = {}
+   for day in dayNames:
+      senior = list(slots.view(config['min_required_senior'], day))
+      total = slots.view(config['min_required_total'], day)
+      regular = [ t - s for t, s in zip(total, senior) ]
+      days[(filename, week, day)] = (byWeek[week][day], regular, senior)
+
+   # Print progress after each round of halving.
+   def reportRound(candidates, seeds):
+      print 'evaluated {0} candidates on {1} seeds'.format(len(candidates),
+                                                           len(seeds))
+
+   sweep = Sweep(days, processes, ResultCache(cacheFile, resultStamp(days)))
+   try:
+      results = sweep.halve(candidateGrid(), range(1, seeds + 1),
+                            callback=reportRound)
+   finally:
+      sweep.close()
+
+   # Print the Pareto front of each quota offset, delays in minutes.
+   print '\t'.join(['quota_offset', 'two_min_threshold', 'ten_min_threshold',
+                    'two_min_pref', 'mean_2_delay', 'mean_10_delay'])
+   for offset in QUOTA_OFFSETS:
+      candidates = [ c for c in results if c[1] == offset ]
+      points = dict([ (c, (results[c]['2'], results[c]['10']))
+                      for c in candidates ])
+      for c in sorted(paretoFront(candidates, points), key=lambda c : points[c]):
+         params, offset = c
+         row = [offset, params[0] / 60, params[1] / 60, params[2],
+                '{0:.3f}'.format(points[c][0] / 60),
+                '{0:.3f}'.format(points[c][1] / 60)]
+         print '\t'.join(map(str, row))
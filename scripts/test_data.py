@@ -0,0 +1,28 @@
+from data import QueueData
+import os, shutil, tempfile, unittest
+
+class QueueDataCacheTest(unittest.TestCase):
+   def setUp(self):
+      self.directory = tempfile.mkdtemp()
+      self.filename = os.path.join(self.directory, 'requests.tsv')
+
+   def tearDown(self):
+      shutil.rmtree(self.directory)
+
+   def testNonASCIICategoriesRoundTrip(self):
+      # UTF-8 text, and bytes that are not valid UTF-8.
+      titles = ['caf\xc3\xa9', 'r\xe9sum\xe9 \xff']
+      file = open(self.filename, 'wb')
+      file.write('time_in\ttime_out\tqueue_type\tcourse\ttitle\n')
+      for i in range(len(titles)):
+         file.write('{0}\t{1}\t2\t143\t{2}\n'.format(1380542468 + i,
+                                                      1380544243 + i, titles[i]))
+      file.close()
+      for load in range(2):
+         data = QueueData(self.filename)
+         self.assertTrue(os.path.exists(data._cachePath()))
+         self.assertEqual([ req.title for req in data ], titles)
+         self.assertTrue(all(isinstance(req.title, str) for req in data))
+
+if __name__ == '__main__':
+   unittest.main()
@@ -0,0 +1,35 @@
+from datetime import datetime
+from data import QueueRequest
+from quotasearch import QuotaSearch
+import unittest
+
+# Returns a request of given queue type made at the given hour and minute of
+# an arbitrary day.
+def request(hour, minute, queueType='2'):
+   time = datetime(2013, 10, 3, hour, minute)
+   return QueueRequest({ 'time_in': time, 'time_out': time,
+                         'queue_type': queueType, 'course': '', 'title': '' })
+
+class QuotaSearchTest(unittest.TestCase):
+   def setUp(self):
+      # One day with requests in the first two hours, none in the third.
+      day = [ request(12, 5), request(12, 20), request(13, 10),
+              request(13, 40, '10') ]
+      self.search = QuotaSearch([day], [1, 2], (600, 2400, 1.5), processes=1)
+
+   def tearDown(self):
+      self.search.close()
+
+   def testZeroStaffedHourWithArrivalsIsInfeasible(self):
+      regular, senior = [1, 0, 0], [0, 0, 0]
+      self.assertEqual(self.search.p90s(regular, senior)[1], float('inf'))
+      self.assertFalse(self.search.feasible(regular, senior, 3600))
+      self.assertFalse(self.search.feasible(regular, senior, 3600, last=1))
+
+   def testSearchDoesNotLeaveArrivalsUnstaffed(self):
+      regular = self.search.search([0, 0, 0], 3600, [0, 0, 0])
+      self.assertNotEqual(regular, [0, 0, 0])
+      self.assertTrue(self.search.feasible(regular, [0, 0, 0], 3600))
+
+if __name__ == '__main__':
+   unittest.main()
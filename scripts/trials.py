@@ -0,0 +1,69 @@
+from multiprocessing import Pool, cpu_count
+from simulation import Simulator
+from policies import crisisThresholdsAndFlip
+from stats import RunningStats, VectorStats
+
+# Trial configuration of a worker process, set once per process by _initWorker
+# so that requests are not sent again with every trial.
+_config = None
+
+# Stores the trial configuration in a worker process.
+def _initWorker(requests, regular, senior, policyParams, serviceModel):
+   global _config
+   _config = (requests, regular, senior, policyParams, serviceModel)
+
+# Runs one simulation seeded with 'seed' and returns the pair (seed, delays),
+# where delays is the per-request delay vector of the trial.
+def _runTrial(seed):
+   requests, regular, senior, policyParams, serviceModel = _config
+   sim = Simulator(requests, seed=seed, serviceModel=serviceModel)
+   policy = crisisThresholdsAndFlip(*policyParams, rng=sim.random)
+   report = sim.run(lambda report : None, policy, regular, senior)
+   return seed, report.delays()
+
+class TrialSummary:
+   # Initializes an empty summary of trial delay vectors.
+   def __init__(self):
+      self.byRequest = VectorStats()
+      self.trialMeans = RunningStats()
+
+   # Adds the delay vector of one trial.
+   def add(self, delays):
+      self.byRequest.add(delays)
+      if len(delays) > 0:
+         self.trialMeans.add(float(sum(delays)) / len(delays))
+
+# Runs seeded simulations of the given requests, one per seed in 'seeds', and
+# returns a TrialSummary of their delays. 'regular' and 'senior' are the hourly
+# TA requirements and 'policyParams' are the arguments to
+# policies.crisisThresholdsAndFlip. Trials are spread over 'processes' worker
+# processes (all cores if None), and each delay vector is added to the summary
+# as soon as its trial finishes. If given, 'callback' is called with
+# (seed, delays, summary) after each trial is added, and service times come from
+# 'serviceModel' (a service.ServiceTimeModel).
+def runTrials(requests, regular, senior, policyParams, seeds, processes=None,
+              callback=None, serviceModel=None):
+   summary = TrialSummary()
+   config = (requests, regular, senior, policyParams, serviceModel)
+
+   # Adds one trial result to the summary.
+   def collect(result):
+      seed, delays = result
+      summary.add(delays)
+      if callback != None:
+         callback(seed, delays, summary)
+
+   if processes == None:
+      processes = cpu_count()
+   if processes == 1:
+      _initWorker(*config)
+      for seed in seeds:
+         collect(_runTrial(seed))
+   else:
+      pool = Pool(processes, _initWorker, config)
+      try:
+         for result in pool.imap_unordered(_runTrial, seeds):
+            collect(result)
+      finally:
+         pool.terminate()
+   return summary